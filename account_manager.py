@@ -1,16 +1,28 @@
-import bcrypt
 from getpass import getpass
+from password_policy import get_policy
 from user_account import UserAccount
 from account_validator import AccountValidator
-from account_storage import FILE_PATH, load_accounts
+from profile_validation import (
+    validate_name, validate_username, validate_phone_number,
+    validate_password, validate_email
+)
+from account_storage import FILE_PATH, get_store
+from session_manager import get_session_manager
+from account_search import search_accounts, list_accounts, PREFIX, SUBSTRING, SORT_FIELDS
+from lock_scheduler import get_lock_scheduler
 from games import Games
+import audit_log
 from to_do_list import UserToDoList
 from helper import (
     log_info, log_warning, menu_choice, 
-    update_accounts_file, remove_account, 
-    remove_account_by_username, edit_profile
+    update_account, remove_account, 
+    remove_account_by_username, edit_profile,
+    print_account_summary
 )
 
+# Fields shown by the admin listing (the rest of each account is never read for it)
+LIST_FIELDS = ("username", "first name", "last name", "email", "role", "is_locked")
+
 # ------------------ AccountManager Class ------------------
 class AccountManager:
 
@@ -24,25 +36,7 @@ class AccountManager:
         log_info("Starting account creation process...")
         while True:
             fname, lname = self.user_account.get_user_info()
-            errors = []
-            # Validate first name (fname)
-            if not fname:
-                errors.append("🚫 First name cannot be empty.")
-            elif not fname.isalpha():
-                errors.append("❌ First name should only contain letters.")
-            elif len(fname) < 3:
-                errors.append("⏬ First name should be at least 3 characters long.")
-            elif len(fname) > 15:
-                errors.append("⏫ First name should be at most 15 characters long.")
-            # Validate last name (lname)
-            if not lname:
-                errors.append("🚫 Last name cannot be empty.")
-            elif not lname.isalpha():
-                errors.append("❌ Last name should only contain letters.")
-            elif len(lname) < 3:
-                errors.append("⏬ Last name should be at least 3 characters long.")
-            elif len(lname) > 15:
-                errors.append("⏫ Last name should be at most 15 characters long.")
+            errors = validate_name("First name", fname) + validate_name("Last name", lname)
 
             if errors:
                 for error in errors:
@@ -60,18 +54,10 @@ class AccountManager:
             username = self.user_account.get_username()
             if not self.validator.is_unique("username", username):
                 continue
-            if not username:
-                print("🚫 Username cannot be empty.")
-                log_warning("Username cannot be empty.")
-            elif not username.isalnum():
-                print("❌ Usernames should only contain letters and numbers.")
-                log_warning("Username should only contain letters and numbers.")
-            elif len(username) < 8:
-                print("⏬ Username is too short (min 8 characters).")
-                log_warning("Username is too short.")
-            elif len(username) > 15:
-                print("⏫ Username is too long (max 15 characters).")
-                log_warning("Username is too long.")
+            errors = validate_username(username)
+            if errors:
+                print(errors[0])
+                log_warning(errors[0])
             else:
                 self.user_account.username = username
                 log_info(f"Username '{username}' validated successfully.")
@@ -81,13 +67,10 @@ class AccountManager:
         # Phone number validation
         while True:
             phone = self.user_account.get_user_number()
-            if not self.user_account.validate_phone_number(phone):
-                print("❌ Invalid phone number format.")
-                log_warning("Invalid phone number format.")
-                continue
-            if not phone.startswith(("873","514","438","263")):
-                print("❌ Phone number must start with 873, 514, 438, or 263.")
-                log_warning("Phone number must start with 873, 514, 438, or 263.")
+            errors = validate_phone_number(phone)
+            if errors:
+                print(errors[0])
+                log_warning(errors[0])
                 continue
             if not self.validator.is_unique("phone number", phone):
                 continue
@@ -105,15 +88,15 @@ class AccountManager:
                 log_info("Generated password.")
                 self.user_account.password = password
                 break
-            if not self.user_account.validate_password(password):
-                print("❌ Password must have at least 8 characters, including uppercase, lowercase, a digit, and a special character.")
+            errors = validate_password(password)
+            if errors:
+                print(errors[0])
                 log_warning("Invalid password format.")
                 continue
             if not self.validator.confirm_password(password):
                 continue
             # adding hashing to the password
-            hashed_password = bcrypt.hashpw(password.encode(), bcrypt.gensalt())  # Hash password
-            self.user_account.password = hashed_password.decode()  # Store the hashed password as a string
+            self.user_account.password = get_policy().hash(password)  # Store the hashed password as a string
             log_info("Password validation successful!")
             break
 
@@ -122,14 +105,10 @@ class AccountManager:
             email = input("Enter your email: ").strip().lower()
             if not self.validator.is_unique("email", email):
                 continue
-            if not self.user_account.validate_email(email):
-                print("⚠️ Invalid email format.")
-                log_warning("Invalid email format.")
-                continue
-            allowed_domains = (".com", ".org", ".net", ".ca")
-            if not email.endswith(allowed_domains):
-                print("⚠️ Email should end with .com, .org, .net, or .ca.")
-                log_warning("Email should end with .com, .org, .net, or .ca.")
+            errors = validate_email(email)
+            if errors:
+                print(errors[0])
+                log_warning(errors[0])
                 continue
             self.user_account.email = email
             print("✅ Email is valid!")
@@ -159,9 +138,14 @@ class AccountManager:
 
     def post_login_menu(self, matched_account):
         # """Displays a post-login menu based on whether the user is admin or non-admin."""
-        accounts = load_accounts() # Reload accounts if needed
         # ✅ Only show the menu if login is successful
-        if matched_account:         
+        if matched_account:
+            # Work on the store's own record (not a reloaded copy) for the whole session
+            store = get_store()
+            matched_account = store.find("username", matched_account["username"]) or matched_account
+            sessions = get_session_manager()
+            token = sessions.issue(matched_account)
+            accounts = []  # kept for the helpers' signatures; the store is the source of truth
             # Non-admin user menu
             if matched_account.get("role", "user").lower() != "admin":
                     print(
@@ -176,6 +160,9 @@ class AccountManager:
                         )
                     while True:
                         choice = menu_choice("\nplease enter your option between 1 and 6: ",1,6)
+                        if sessions.validate(token) is None:
+                            print("⌛ Your session has ended. Please log in again.")
+                            return
 
                         if choice == 1:
                             print("\nYour profile information: \n")
@@ -189,6 +176,7 @@ class AccountManager:
                             deletion_confirmation = input("Are you sure you want to delete your account? (y/n): ").strip().lower()
                             if deletion_confirmation == "y":
                                 remove_account(accounts, matched_account)
+                                sessions.revoke(token)
                                 return
                             else:
                                 log_info(f"Account deletion canceled by user: {matched_account['username']}.")
@@ -233,6 +221,8 @@ class AccountManager:
                             # to do list
                             UserToDoList.run_todo_list(matched_account["username"])
                         elif choice == 6:
+                            sessions.revoke(token)
+                            audit_log.record_event(audit_log.LOGOUT, matched_account["username"])
                             print("Logging out...")
                             print("\nExiting the program, Goodbye!")
                             return
@@ -246,80 +236,133 @@ class AccountManager:
                     "3. Edit profiles.\n"
                     "4. Remove accounts.\n"
                     "5. Unlock accounts.\n"
-                    "6. Log out.\n")
+                    "6. Activity report.\n"
+                    "7. Log out.\n")
 
                     while True:
-                        choice = menu_choice("Please enter your option (1-6): ", 1, 6)
+                        choice = menu_choice("Please enter your option (1-7): ", 1, 7)
+                        if sessions.validate(token) is None:
+                            print("⌛ Your session has ended. Please log in again.")
+                            return
                         if choice == 1:
-                            print("\nUser Profiles:")
-                            for account in accounts:
-                                if account.get("role","user").lower() == "user":
-                                    for key, value in account.items():
-                                        print(f"{key.title()}: {value}")
-                                print("*" * 50)
+                            self.list_accounts_menu()
                         elif choice == 2:
-                            print("Filter Profiles:")
-                            filtered_username  = input("please enter the username of the user you want to filter. ").strip()
-                            for account in accounts:
-                                if account["username"].strip().lower() == filtered_username.lower():
-                                    for key, value in account.items():
-                                        print(f"{key.title()}: {value}")
-                                        print("*" * 40)
-                                    break
+                            self.search_accounts_menu()
                         elif choice == 3:
                             print("Editing Profiles:")
                             filtered_username  = input("please enter the username of the user you want to edit. ").strip()
-                            account_to_edit = None
-                            for account in accounts:
-                                if account['username'].strip().lower() == filtered_username.lower():
-                                    account_to_edit = account
-                                    break
+                            account_to_edit = store.find("username", filtered_username)
                             if account_to_edit is None:
                                 log_warning(f"User {filtered_username} not found.")
                                 print("❌ User not found. Please try again.")
+                                suggestions, _ = search_accounts(filtered_username, field="username", limit=5)
+                                if suggestions:
+                                    print("🔎 Did you mean:")
+                                    for account in suggestions:
+                                        print_account_summary(account)
                             else:
                                 edit_profile(account_to_edit, accounts, FILE_PATH)
-                            log_info(f"Profile updated for user: {account_to_edit['username']}.")
+                                log_info(f"Profile updated for user: {account_to_edit['username']}.")
                         elif choice == 4:
                             print("Remove Accounts:")
                             filtered_username = input("please enter the username of the user you want to remove. ").strip()
                             remove_account_by_username(accounts, filtered_username)
                         elif choice == 5:
                             print("🔒 Locked Accounts:")
-                            # locked_accounts = [account for account in account if account.get("is_locked") is True]
-                            locked_accounts = [account for account in accounts if account.get("is_locked")]
+                            # The lock scheduler keeps the locked set up to date, so no scan of every account
+                            lock_scheduler = get_lock_scheduler()
+                            locked_usernames = lock_scheduler.locked_usernames()
                             
-                            if not locked_accounts:
+                            if not locked_usernames:
                                 print("✅ No locked accounts. ")
                             else:
-                                for account in locked_accounts:
-                                    print(f"- {account['username']}")
+                                for username in locked_usernames:
+                                    print(f"- {username}")
                                     print("*" * 40)
                             
                                 unlock = input("Do you want to unlock an account? (y/n): ").strip().lower()
                                 if unlock == "y":
                                     username_to_unlock = input("Enter the username to unlock: ").strip()
                                     
-                                    # Find the account in the locked list
-                                    unlocked = False
-                                    for account in locked_accounts:
-                                        if account['username'].lower() == username_to_unlock.lower():
-                                            account["is_locked"] = False
-                                            account.pop("lock_time",None) # Remove lock time since it's unlocked
-                                            print(f"✅ Account for {account['username']} has been unlocked. ")
-                                            unlocked = True
-                                            break
-
-                                    if unlocked:
-                                        # Save all accounts back to the JSON file
-                                        update_accounts_file(accounts)
+                                    # O(1) check against the locked set, then one index lookup
+                                    account = None
+                                    if lock_scheduler.is_locked(username_to_unlock):
+                                        account = store.find("username", username_to_unlock)
+                                    if account is not None:
+                                        # Remove lock time since it's unlocked; only this account is persisted
+                                        update_account(account, {"is_locked": False}, unset=("lock_time",))
+                                        audit_log.record_event(audit_log.ACCOUNT_UNLOCKED, account["username"], by="admin")
+                                        print(f"✅ Account for {account['username']} has been unlocked. ")
                                     else:
                                         print("❌ Username not found in locked accounts.")
                                 else: 
                                     print("❌ Account unlocking cancelled.")
 
                         elif choice == 6:
+                            print("📊 Activity Report:")
+                            report_username = input("Username to report on (leave blank for everyone): ").strip() or None
+                            hours = input("How many past hours? (default 24): ").strip()
+                            seconds = float(hours) * 3600 if hours.replace(".", "", 1).isdigit() else 24 * 3600
+                            events = audit_log.recent_events(seconds, username=report_username)
+                            for event in events[-50:]:
+                                print(f"- {event['time']} {event['event']} {event['username']} ({event['outcome']})")
+                            print(f"🧾 {len(events)} event(s) in that period.")
+                            top_failures = audit_log.top_users(audit_log.LOGIN, audit_log.FAILURE, seconds, 5)
+                            if top_failures:
+                                print("🚨 Most failed logins:")
+                                for name, count in top_failures:
+                                    print(f"- {name}: {count}")
+
+                        elif choice == 7:
+                            sessions.revoke(token)
+                            audit_log.record_event(audit_log.LOGOUT, matched_account["username"])
                             print("Logging out...")
                             print("\nExiting the program, Goodbye!")
                             return
-        
\ No newline at end of file
+
+       # *********************** Admin Listing ***********************
+
+    def list_accounts_menu(self):
+        """Admin listing: every account one page at a time, without loading them all at once."""
+        print("\nUser Profiles:")
+        sort = input(f"Sort by ({', '.join(SORT_FIELDS)}; default username): ").strip().lower() or "username"
+        if sort not in SORT_FIELDS:
+            print("❌ Unknown sort field, sorting by username.")
+            sort = "username"
+        descending = input("Descending order? (y/n): ").strip().lower() == "y"
+        cursor = None
+        while True:
+            records, cursor = list_accounts(cursor, fields=LIST_FIELDS, sort=sort, descending=descending)
+            for record in records:
+                print_account_summary(record)
+            print("*" * 50)
+            if cursor is None:
+                print("✅ End of the list.")
+                break
+            if input("Show more? (y/n): ").strip().lower() != "y":
+                break
+
+       # *********************** Admin Search ***********************
+
+    def search_accounts_menu(self):
+        """Admin search: prefix or substring match on username/email/name, optional filters, one page at a time."""
+        print("🔎 Search Accounts:")
+        text = input("Search text (username, email or name; leave blank to only filter): ").strip()
+        mode = PREFIX
+        if text and input("Match anywhere in the text instead of at the start? (y/n): ").strip().lower() == "y":
+            mode = SUBSTRING
+        filters = {}
+        if input("Add filters (role, locked, creation date)? (y/n): ").strip().lower() == "y":
+            filters["role"] = input("Role (user/admin, leave blank for any): ").strip().lower() or None
+            filters["is_locked"] = {"y": True, "n": False}.get(input("Locked? (y/n, leave blank for any): ").strip().lower())
+            filters["created_from"] = input("Created on or after (YYYY-MM-DD, leave blank for any): ").strip() or None
+            filters["created_to"] = input("Created before (YYYY-MM-DD, leave blank for any): ").strip() or None
+        offset = 0
+        while True:
+            page, offset = search_accounts(text, mode=mode, offset=offset, **filters)
+            if not page:
+                print("❌ No matching accounts.")
+            for account in page:
+                print_account_summary(account)
+            if offset is None or input("Show more? (y/n): ").strip().lower() != "y":
+                break
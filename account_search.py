@@ -0,0 +1,322 @@
+import json, base64, bisect, logging, binascii, threading
+from array import array
+from account_storage import get_store
+from metrics import timed
+
+# Fields with a sorted prefix index and substring search; "name" is "<first name> <last name>"
+SEARCH_FIELDS = ("username", "email", "name")
+
+# Orders the admin listing can use (ties are broken by username)
+SORT_FIELDS = SEARCH_FIELDS + ("date_created",)
+
+# Search modes
+PREFIX = "prefix"
+SUBSTRING = "substring"
+
+# Results per page when no limit is given
+DEFAULT_PAGE_SIZE = 20
+
+# A set filter (locked accounts, a role) is only sorted into its own result order when it is this many
+# times smaller than the whole index; otherwise the username order is scanned until the page is full
+SET_SCAN_RATIO = 4
+
+_EMPTY = array("i")
+
+def _normalize(value):
+    return str(value or "").strip().lower()
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def sort_value(account, field):
+    """The value an account is ordered by for `field` (one of SORT_FIELDS)."""
+    if field == "name":
+        return _normalize(f"{account.get('first name') or ''} {account.get('last name') or ''}")
+    if field == "date_created":
+        return str(account.get("date_created") or "")
+    return _normalize(account.get(field))
+
+# ------------------ AccountSearchIndex Class ------------------
+class AccountSearchIndex:
+    """
+    Admin query engine over the account store.
+    Every account gets an internal id; for each search field (and date_created) the ids are kept
+    sorted by the field's lowercase value, so a prefix is two binary searches, and a trigram ->
+    ids posting list narrows a substring search to the accounts sharing its rarest trigram.
+    Locked accounts and roles are kept as id sets for the filters.
+    The index listens to the store (see AccountBackend.add_listener), is built on the first
+    query, and is rebuilt lazily whenever the store reloads every account. The trigram lists,
+    the slowest part to build, wait for the first substring search.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.RLock()
+        self._source = None
+        self._dirty = True
+        self._reset()
+        store.add_listener(self)
+
+    def _reset(self):
+        self._records = []       # id -> account, None once it was removed or re-indexed under a new id
+        self._ids = {}           # lowercase username -> id
+        self._values = {field: [] for field in SORT_FIELDS}  # id -> lowercase value
+        self._sorted = {field: [] for field in SORT_FIELDS}  # ids ordered by (value, username)
+        self._trigrams = None    # trigram -> ids (ascending, may include removed ids); built on demand
+        self._locked = set()
+        self._roles = {}         # role -> set of ids
+
+    # ------------------ Store Listener ------------------
+    def rebuild(self, source):
+        with self._lock:
+            self._source, self._dirty = source, True
+
+    def add(self, account):
+        with self._lock:
+            if not self._dirty:
+                self._discard(_normalize(account["username"]))
+                self._insert(account)
+
+    def discard(self, account):
+        with self._lock:
+            if not self._dirty:
+                self._discard(_normalize(account["username"]))
+                # Removed ids stay in the trigram lists; once they outnumber the live ones, start over
+                if len(self._records) > 1024 and len(self._records) > 2 * len(self._ids):
+                    self._dirty = True
+
+    # ------------------ Building ------------------
+    def _build(self):
+        self._reset()
+        for account in self._source():
+            self._insert(account, keep_sorted=False)
+        for field, ids in self._sorted.items():
+            ids.sort(key=self._sort_key(field))
+        self._dirty = False
+        logging.info(f"Account search index built over {len(self._ids)} account(s).")
+
+    def _sort_key(self, field):
+        values, usernames = self._values[field], self._values["username"]
+        if field == "username":
+            return values.__getitem__  # already unique
+        return lambda i: (values[i], usernames[i])
+
+    def _search_text(self, i):
+        # "\n" never occurs in a query, so trigrams spanning two fields never match one
+        return "\n".join(self._values[field][i] for field in SEARCH_FIELDS)
+
+    def _add_trigrams(self, i):
+        for gram in _trigrams(self._search_text(i)):
+            postings = self._trigrams.get(gram)
+            if postings is None:
+                postings = self._trigrams[gram] = array("i")
+            postings.append(i)
+
+    def _build_trigrams(self):
+        self._trigrams = {}
+        for i, account in enumerate(self._records):
+            if account is not None:
+                self._add_trigrams(i)
+        logging.info(f"Account search trigrams built: {len(self._trigrams)} distinct.")
+
+    def _insert(self, account, keep_sorted=True):
+        i = len(self._records)
+        self._records.append(account)
+        self._ids[_normalize(account["username"])] = i
+        for field in SORT_FIELDS:
+            self._values[field].append(sort_value(account, field))
+        for field in SORT_FIELDS:
+            if keep_sorted:
+                bisect.insort(self._sorted[field], i, key=self._sort_key(field))
+            else:
+                self._sorted[field].append(i)
+        if self._trigrams is not None:
+            self._add_trigrams(i)
+        if account.get("is_locked"):
+            self._locked.add(i)
+        self._roles.setdefault(_normalize(account.get("role") or "user"), set()).add(i)
+
+    def _discard(self, username):
+        i = self._ids.pop(username, None)
+        if i is None:
+            return
+        for field, ids in self._sorted.items():
+            # The full (value, username) key is unique, so shared names or empty dates don't need a walk
+            key = self._sort_key(field)
+            position = bisect.bisect_left(ids, key(i), key=key)
+            if position < len(ids) and ids[position] == i:
+                del ids[position]
+        self._locked.discard(i)
+        for members in self._roles.values():
+            members.discard(i)
+        self._records[i] = None
+
+    # ------------------ Queries ------------------
+    def _prefix_ids(self, field, prefix):
+        ids, values = self._sorted[field], self._values[field]
+        position = bisect.bisect_left(ids, prefix, key=values.__getitem__)
+        while position < len(ids) and values[ids[position]].startswith(prefix):
+            yield ids[position]
+            position += 1
+
+    def _candidates(self, text, fields, mode, role, is_locked, created_from, created_to):
+        """Ids worth checking, from the most selective structure; may repeat or include removed ids."""
+        if text and mode == PREFIX:
+            for field in fields:
+                yield from self._prefix_ids(field, text)
+            return
+        if text and len(text) >= 3:
+            if self._trigrams is None:
+                self._build_trigrams()
+            yield from min((self._trigrams.get(gram, _EMPTY) for gram in _trigrams(text)), key=len)
+            return
+        if text:
+            yield from range(len(self._records))
+            return
+        by_username = self._sorted["username"]
+        sources = []
+        if is_locked:
+            sources.append(self._locked)
+        if role:
+            sources.append(self._roles.get(role, set()))
+        smallest = min(sources, key=len, default=None)
+        if created_from or created_to:
+            ids, values = self._sorted["date_created"], self._values["date_created"]
+            low = bisect.bisect_left(ids, created_from, key=values.__getitem__) if created_from else 0
+            high = bisect.bisect_left(ids, created_to, key=values.__getitem__) if created_to else len(ids)
+            if smallest is None or high - low < len(smallest):
+                for position in range(low, high):
+                    yield ids[position]
+                return
+        if smallest is not None and len(smallest) * SET_SCAN_RATIO < len(by_username):
+            yield from sorted(smallest)
+            return
+        yield from by_username
+
+    def _matches(self, i, text, fields, mode, role, is_locked, created_from, created_to):
+        if text:
+            if mode == PREFIX:
+                if not any(self._values[field][i].startswith(text) for field in fields):
+                    return False
+            elif not any(text in self._values[field][i] for field in fields):
+                return False
+        account = self._records[i]
+        if role and _normalize(account.get("role") or "user") != role:
+            return False
+        if is_locked is not None and bool(account.get("is_locked")) != is_locked:
+            return False
+        if created_from or created_to:
+            created = self._values["date_created"][i]
+            if not created or (created_from and created < created_from) or (created_to and created >= created_to):
+                return False
+        return True
+
+    @timed("account_search")
+    def search(self, text=None, field=None, mode=PREFIX, role=None, is_locked=None,
+               created_from=None, created_to=None, offset=0, limit=DEFAULT_PAGE_SIZE):
+        """
+        Find accounts whose username, email or name (or only `field`) starts with / contains `text`,
+        optionally only those with a role, a lock state and/or date_created in [created_from, created_to)
+        (ISO dates or timestamps). Returns (accounts, next_offset); next_offset is None on the last page.
+        """
+        if field is not None and field not in SEARCH_FIELDS:
+            raise ValueError(f"Search field must be one of: {', '.join(SEARCH_FIELDS)}.")
+        if mode not in (PREFIX, SUBSTRING):
+            raise ValueError(f"Search mode must be {PREFIX} or {SUBSTRING}.")
+        text, role = _normalize(text), _normalize(role) or None
+        fields = (field,) if field else SEARCH_FIELDS
+        filters = (text, fields, mode, role, is_locked, created_from, created_to)
+        self.store.refresh()
+        with self._lock:
+            if self._dirty:
+                self._build()
+            page, seen, skipped = [], set(), 0
+            for i in self._candidates(*filters):
+                if i in seen or self._records[i] is None or not self._matches(i, *filters):
+                    continue
+                seen.add(i)
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                if len(page) == limit:
+                    return page, offset + limit
+                page.append(self._records[i])
+            return page, None
+
+    @timed("account_sorted_page")
+    def page(self, sort="username", descending=False, after=None, limit=DEFAULT_PAGE_SIZE):
+        """Up to `limit` accounts in `sort` order, starting after the key `after` = (sort value, lowercase username)."""
+        self.store.refresh()
+        with self._lock:
+            if self._dirty:
+                self._build()
+            ids, values, usernames = self._sorted[sort], self._values[sort], self._values["username"]
+            key = lambda i: (values[i], usernames[i])
+            if descending:
+                end = bisect.bisect_left(ids, tuple(after), key=key) if after else len(ids)
+                chosen = ids[max(0, end - limit):end][::-1]
+            else:
+                start = bisect.bisect_right(ids, tuple(after), key=key) if after else 0
+                chosen = ids[start:start + limit]
+            return [self._records[i] for i in chosen]
+
+_search_index = None
+_search_index_lock = threading.Lock()
+
+def get_search_index(store=None):
+    """Return the search index over `store` (default: the current account store), creating it on first use."""
+    global _search_index
+    store = store or get_store()
+    with _search_index_lock:
+        if _search_index is None or _search_index.store is not store:
+            _search_index = AccountSearchIndex(store)
+        return _search_index
+
+def search_accounts(text=None, **options):
+    """Shortcut for get_search_index().search(); see AccountSearchIndex.search for the options."""
+    return get_search_index().search(text, **options)
+
+# ------------------ Listing ------------------
+# Cursors are opaque to clients: the sort order and the (sort value, username) key of the last account shown
+def encode_cursor(sort, descending, account):
+    key = [sort, descending, sort_value(account, sort), _normalize(account["username"])]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_cursor(cursor, sort, descending):
+    try:
+        cursor_sort, cursor_descending, value, username = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("Invalid cursor.")
+    if (cursor_sort, cursor_descending) != (sort, descending):
+        raise ValueError("This cursor belongs to a listing with a different sort order.")
+    return value, username
+
+def project(account, fields=None):
+    """The account limited to `fields` (every field by default); password hashes are never listed."""
+    if fields:
+        return {field: account.get(field) for field in fields if field != "password"}
+    return {key: value for key, value in account.items() if key != "password"}
+
+def list_accounts(cursor=None, limit=DEFAULT_PAGE_SIZE, fields=None, sort="username", descending=False):
+    """
+    One page of the admin listing: up to `limit` accounts in `sort` order (SORT_FIELDS),
+    projected on `fields`, starting after `cursor` (None for the first page).
+    Returns (records, next_cursor); next_cursor is None on the last page.
+    Only the page is read and copied, never the whole account list.
+    """
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"Sort must be one of: {', '.join(SORT_FIELDS)}.")
+    after = decode_cursor(cursor, sort, descending) if cursor else None
+    accounts = get_store().sorted_page(sort, descending, after, limit + 1)
+    next_cursor = encode_cursor(sort, descending, accounts[limit - 1]) if len(accounts) > limit else None
+    return [project(account, fields) for account in accounts[:limit]], next_cursor
+
+def stream_accounts(fields=None, sort="username", descending=False, page_size=DEFAULT_PAGE_SIZE):
+    """Yield the listing one page (a list of records) at a time, following the cursors to the end."""
+    cursor = None
+    while True:
+        records, cursor = list_accounts(cursor, page_size, fields, sort, descending)
+        if records:
+            yield records
+        if cursor is None:
+            return
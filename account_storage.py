@@ -1,36 +1,589 @@
-import json, bcrypt, logging
+import os, sys, json, logging, threading, contextlib
+from concurrent.futures import ThreadPoolExecutor
+from password_policy import get_policy
+from atomic_io import atomic_write_bytes, atomic_write_encoded, fsync_path, file_lock, GroupCommitWriter
+import codec
+from bloom_filter import BloomFilter
+import audit_log
+import metrics
+from metrics import timed
 
 # file path for storing user accounts
-FILE_PATH = r"c:\Users\ARZ\Desktop\USER MANAGEMENT\user_accounts.json"
+FILE_PATH = os.environ.get("ACCOUNTS_FILE_PATH", r"c:\Users\ARZ\Desktop\USER MANAGEMENT\user_accounts.json")
+
+# "json" keeps the accounts in FILE_PATH; "sqlite" keeps them in sqlite_storage.DB_PATH
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "json")
+
+# Schema 1: a bare JSON list that may still contain plaintext (legacy) passwords.
+# Schema 2: {"schema_version": 2, "version": N, "journal_seq": N, "accounts": [...]} where every password is a bcrypt hash.
+# "version" is bumped on every snapshot write and acts as the file's etag.
+SCHEMA_VERSION = 2
+
+# Legacy passwords are hashed and written back this many accounts at a time,
+# so an interrupted migration resumes from the last written batch.
+MIGRATION_BATCH_SIZE = 100
+
+# Optional Bloom filter over the indexed fields, persisted next to the accounts file.
+# It answers "definitely not taken" without loading the accounts when the file hasn't changed.
+BLOOM_FILTER_ENABLED = os.environ.get("ACCOUNT_BLOOM_FILTER", "0") == "1"
+BLOOM_ERROR_RATE = 0.01
+
+# Counters kept in the metrics registry (metrics.snapshot() and the Prometheus dump):
+# account_migration_hashes / account_migration_batches  legacy passwords hashed and batches written
+# account_write_conflicts  coalesced writes that found the file changed by another process and rebased
+# bloom_definite_negatives / bloom_false_positives  lookups the Bloom filter answered alone,
+#                                                   and "maybe present" answers that turned out absent
+
+def bloom_false_positive_rate():
+    """Share of absent values the Bloom filter wrongly reported as maybe present (needs metrics enabled)."""
+    false_positives = metrics.value("bloom_false_positives")
+    absent = metrics.value("bloom_definite_negatives") + false_positives
+    return false_positives / absent if absent else 0.0
+
+# Fields that must be unique across accounts (lookups on them are case-insensitive)
+INDEXED_FIELDS = ("username", "email", "phone number")
+
+# "snapshot" rewrites the whole accounts file on every change.
+# "journal" appends each create/update/delete to a JSON-lines journal next to the file
+# and only rewrites the file when the journal is compacted.
+SNAPSHOT_MODE = "snapshot"
+JOURNAL_MODE = "journal"
+STORAGE_MODE = os.environ.get("ACCOUNT_STORAGE_MODE", SNAPSHOT_MODE)
+
+# Number of journal records after which the journal is folded into a new snapshot
+JOURNAL_COMPACT_THRESHOLD = 1000
+
+# ------------------ AccountBackend Interface ------------------
+class DuplicateAccountError(ValueError):
+    """
+    A write would give two accounts the same unique value. Raised by backends that enforce
+    uniqueness themselves (SQLite), e.g. when another process took the value after it was checked.
+    """
+
+    def __init__(self, fields, message=None):
+        super().__init__(message or f"Already taken: {', '.join(fields)}.")
+        self.fields = fields
+
+class AccountBackend:
+    """
+    Interface shared by every account storage backend:
+    load -> refresh(), get-by-key -> find(), insert -> add(),
+    update -> update(), delete -> remove(), list -> accounts().
+    """
+
+    @staticmethod
+    def _normalize(value):
+        return str(value).strip().lower()
+
+    def refresh(self):
+        """Pick up changes made by other processes."""
+        raise NotImplementedError
+
+    def accounts(self):
+        """Return every account as a list of dicts."""
+        raise NotImplementedError
+
+    def find(self, field, value):
+        """Return the account whose indexed `field` matches `value` (case-insensitive), or None."""
+        raise NotImplementedError
+
+    def exists(self, field, value):
+        return self.find(field, value) is not None
+
+    def locked(self):
+        """Context manager held around a read-modify-write cycle that spans several calls."""
+        return contextlib.nullcontext()
+
+    def add(self, account):
+        raise NotImplementedError
+
+    def add_many(self, accounts):
+        """Add several new accounts; backends override this to persist them in one write."""
+        for account in accounts:
+            self.add(account)
+
+    def update(self, account, changes, unset=()):
+        raise NotImplementedError
+
+    def update_many(self, updates):
+        """Apply several (account, changes, unset) updates; backends override this to persist them in one write."""
+        for account, changes, unset in updates:
+            self.update(account, changes, unset)
+
+    def remove(self, account):
+        raise NotImplementedError
+
+    def replace_all(self, accounts):
+        raise NotImplementedError
+
+    def iter_accounts(self):
+        """Yield every account one at a time."""
+        yield from self.accounts()
+
+    def sorted_page(self, sort="username", descending=False, after=None, limit=20):
+        """
+        Up to `limit` accounts ordered by `sort` (account_search.SORT_FIELDS) and then username,
+        starting after the key `after` = (sort value, lowercase username). Served by the in-memory
+        search index; backends with a suitable native index override it.
+        """
+        # Imported lazily: account_search builds on this module
+        import account_search
+        return account_search.get_search_index(self).page(sort, descending, after, limit)
+
+    def add_listener(self, listener):
+        """
+        Keep a secondary index (e.g. account_search.AccountSearchIndex) in step with the accounts:
+        listener.rebuild(source) whenever every account may have changed (source() returns them),
+        listener.discard(account) before an account changes or is removed, listener.add(account) after
+        it is created or changed.
+        """
+        raise NotImplementedError
+
+# ------------------ AccountStore Class ------------------
+class AccountStore(AccountBackend):
+    """
+    Process-wide, in-memory copy of the accounts file.
+    The file is parsed once and only re-read when its mtime/size changes on disk.
+    Keeps case-insensitive hash indexes on username, email and phone number,
+    so lookups and uniqueness checks are O(1) instead of a full parse plus a scan.
+    """
+
+    def __init__(self, file_path, mode=None, use_bloom=None):
+        self.file_path = file_path
+        self.journal_path = file_path + ".journal"
+        self.bloom_path = file_path + ".bloom"
+        self.mode = mode or STORAGE_MODE
+        self.use_bloom = BLOOM_FILTER_ENABLED if use_bloom is None else use_bloom
+        self._accounts = []
+        self._indexes = {field: {} for field in INDEXED_FIELDS}
+        self._signature = None
+        self._loaded = False
+        self._journal_seq = 0       # seq of the last journal record applied
+        self._journal_offset = 0    # bytes of the journal already replayed
+        self._journal_records = 0   # records in the journal since the last compaction
+        self._version = 0           # snapshot version (etag) the in-memory copy is based on
+        self._unsaved = []          # records applied in memory but not yet in the snapshot file
+        self._lock = threading.RLock()
+        self._listeners = []        # secondary indexes notified of every change (see add_listener)
+        # Held by every process around read-modify-write cycles on the file
+        self._file_lock = file_lock(file_path)
+        # The persisted filter is only trusted while the file signature it was saved with still matches
+        self._bloom, self._bloom_signature = (None, None)
+        if self.use_bloom:
+            self._bloom, self._bloom_signature = BloomFilter.load(self.bloom_path)
+        # Snapshot rewrites and journal fsyncs arriving within WRITE_COALESCE_MS are grouped into one
+        self._snapshot_writer = GroupCommitWriter(self._flush_snapshot)
+        self._journal_writer = GroupCommitWriter(self._flush_journal)
+
+    @staticmethod
+    def _path_signature(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _file_signature(self):
+        return (self._path_signature(self.file_path), self._path_signature(self.journal_path))
+
+    @property
+    def etag(self):
+        """(snapshot version, last journal seq) of the state this store is based on."""
+        return (self._version, self._journal_seq)
+
+    @contextlib.contextmanager
+    def locked(self):
+        with self._lock, self._file_lock:
+            yield
+
+    @timed("accounts_parse")
+    def _read_file(self):
+        """Return (accounts, schema_version, journal_seq, version) as stored on disk."""
+        try:
+            # The format (compact/pretty JSON, msgpack, marshal) is detected from the file itself
+            data = codec.load_existing(self.file_path)
+            logging.info("Accounts loaded successfully.")
+        except FileNotFoundError:
+            print("🚨 File not found! Creating a new one...")
+            logging.warning(f"Accounts file {self.file_path} not found, starting empty.")
+            return [], SCHEMA_VERSION, 0, 0
+        except codec.UnreadableFileError as e:
+            # Starting empty here would let the next add overwrite every account
+            logging.error(str(e))
+            raise
+        if isinstance(data, list):
+            return data, 1, 0, 0
+        if isinstance(data, dict) and isinstance(data.get("accounts"), list):
+            return data["accounts"], data.get("schema_version", 1), data.get("journal_seq", 0), data.get("version", 0)
+        error = codec.UnreadableFileError(self.file_path, "not an accounts snapshot")
+        logging.error(str(error))
+        raise error
+
+    def _new_bloom(self):
+        # Room for twice the current entries, so it is rebuilt only after the data doubles
+        capacity = max(1024, 2 * len(INDEXED_FIELDS) * len(self._accounts))
+        return BloomFilter(capacity, BLOOM_ERROR_RATE)
+
+    def _reindex(self):
+        self._indexes = {field: {} for field in INDEXED_FIELDS}
+        if self.use_bloom:
+            self._bloom = self._new_bloom()
+            self._bloom_signature = None
+        for account in self._accounts:
+            self._index_account(account)
+        for listener in self._listeners:
+            listener.rebuild(self._listener_source)
+
+    def _listener_source(self):
+        return list(self._accounts)
+
+    def add_listener(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+            listener.rebuild(self._listener_source)
+
+    def _notify(self, event, account):
+        for listener in self._listeners:
+            getattr(listener, event)(account)
+
+    @staticmethod
+    def _bloom_key(field, value):
+        return f"{field}\0{value}"
+
+    def _index_account(self, account):
+        for field in INDEXED_FIELDS:
+            if account.get(field):
+                key = self._normalize(account[field])
+                self._indexes[field][key] = account
+                if self._bloom is not None:
+                    self._bloom.add(self._bloom_key(field, key))
+        if self._bloom is not None and self._bloom.is_full:
+            self._reindex()
+
+    def _save_bloom(self):
+        """Rebuild the Bloom filter from the current indexes (dropping deleted ones) and persist it."""
+        self._bloom = self._new_bloom()
+        for field, index in self._indexes.items():
+            for key in index:
+                self._bloom.add(self._bloom_key(field, key))
+        signature = self._file_signature()
+        self._bloom.save(self.bloom_path, [list(part) if part else None for part in signature])
+
+    def _unindex_account(self, account):
+        for field in INDEXED_FIELDS:
+            if account.get(field):
+                self._indexes[field].pop(self._normalize(account[field]), None)
+
+    def _write_file(self, schema_version=SCHEMA_VERSION):
+        """Write a full snapshot and drop the journal records it now contains."""
+        payload = {
+            "schema_version": schema_version,
+            "version": self._version + 1,
+            "journal_seq": self._journal_seq,
+            "accounts": self._accounts
+        }
+        atomic_write_encoded(self.file_path, payload)
+        self._version += 1
+        self._unsaved = []
+        # The snapshot records journal_seq first, so a crash before this removal
+        # only leaves records that the next replay skips.
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._signature = self._file_signature()
+        if self.use_bloom:
+            self._save_bloom()
+
+    def _flush_snapshot(self):
+        with self._lock, self._file_lock:
+            # Optimistic concurrency: if another process wrote the file since our copy was loaded,
+            # reload it and re-apply only our unsaved changes instead of overwriting theirs.
+            if self._file_signature() != self._signature:
+                metrics.count("account_write_conflicts")
+                logging.warning("Accounts file changed on disk; re-applying local changes on top of it.")
+                self.refresh()
+            self._write_file()
+
+    def _flush_journal(self):
+        with self._lock:
+            if os.path.exists(self.journal_path):
+                fsync_path(self.journal_path)
+
+    def refresh(self):
+        """
+        Bring the in-memory copy up to date with disk.
+        A changed snapshot triggers a full reload; a journal that only grew
+        is replayed from where the last replay stopped. Changes not yet written
+        (see WRITE_COALESCE_MS) are re-applied on top of a reloaded file.
+        """
+        with self._lock:
+            signature = self._file_signature()
+            if self._loaded and signature == self._signature:
+                return
+            journal_size = signature[1][1] if signature[1] else 0
+            full_reload = (
+                not self._loaded
+                or signature[0] != self._signature[0]
+                or journal_size < self._journal_offset
+            )
+            if full_reload:
+                self._accounts, schema_version, self._journal_seq, self._version = self._read_file()
+                self._journal_offset = 0
+                self._journal_records = 0
+                self._reindex()
+            self._replay_journal()
+            if full_reload:
+                for record in self._unsaved:
+                    self._apply(record)
+            self._signature = self._file_signature()
+            self._loaded = True
+            if full_reload and schema_version < SCHEMA_VERSION:
+                with self._file_lock:
+                    self._migrate_legacy_passwords()
+                self._reindex()
+
+    def _replay_journal(self):
+        """Apply the journal records written after the last replay."""
+        try:
+            with open(self.journal_path, "rb") as file:
+                file.seek(self._journal_offset)
+                for line in file:
+                    # A line without a newline is a torn write from a crash; it is ignored
+                    # and overwritten by the next append.
+                    if not line.endswith(b"\n"):
+                        break
+                    self._journal_offset += len(line)
+                    self._journal_records += 1
+                    record = json.loads(line)
+                    if record["seq"] > self._journal_seq:
+                        self._apply(record)
+                        self._journal_seq = record["seq"]
+        except FileNotFoundError:
+            pass
+
+    def _apply(self, record):
+        """Apply one create/import/update/update_many/delete/replace record to the in-memory accounts and indexes."""
+        if record["op"] == "replace":
+            self._accounts = list(record["accounts"])
+            self._reindex()
+            return
+        if record["op"] == "import":
+            for account in record["accounts"]:
+                self._apply({"op": "create", "account": account})
+            return
+        if record["op"] == "update_many":
+            for update in record["updates"]:
+                self._apply(dict(update, op="update", seq=record["seq"]))
+            return
+        if record["op"] == "create":
+            if self._normalize(record["account"]["username"]) in self._indexes["username"]:
+                logging.error(f"Dropped conflicting registration for existing username: {record['account']['username']}")
+                return
+            self._accounts.append(record["account"])
+            self._index_account(record["account"])
+            self._notify("add", record["account"])
+            return
+        account = self._indexes["username"].get(record["username"])
+        if account is None:
+            logging.warning(f"Journal record {record['seq']} refers to a missing account: {record['username']}")
+            return
+        self._unindex_account(account)
+        self._notify("discard", account)
+        if record["op"] == "delete":
+            self._accounts.remove(account)
+            return
+        account.update(record.get("set", {}))
+        for field in record.get("unset", []):
+            account.pop(field, None)
+        self._index_account(account)
+        self._notify("add", account)
+
+    def _commit(self, record):
+        """
+        Apply a mutation record and persist it according to the storage mode.
+        The file lock is held from the refresh to the write, so the record always
+        lands on top of whatever other processes wrote before it.
+        """
+        with self._lock, self._file_lock:
+            self.refresh()
+            self._journal_seq += 1
+            record["seq"] = self._journal_seq
+            self._apply(record)
+            if self.mode != JOURNAL_MODE:
+                self._unsaved.append(record)
+                self._snapshot_writer.request()
+                return
+            self._append_journal(record)
+            if self._journal_records >= JOURNAL_COMPACT_THRESHOLD:
+                self.compact()
+
+    def _append_journal(self, record):
+        line = (json.dumps(record) + "\n").encode()
+        with open(self.journal_path, "ab") as file:
+            # Drop a torn tail left by a crash so the new record starts on a clean line
+            if file.tell() != self._journal_offset:
+                file.truncate(self._journal_offset)
+            file.write(line)
+        self._journal_offset += len(line)
+        self._journal_records += 1
+        self._signature = self._file_signature()
+        self._journal_writer.request()
+
+    def compact(self):
+        """Fold the journal into a new snapshot of the accounts file."""
+        with self._lock, self._file_lock:
+            self.refresh()
+            if self._snapshot_writer.pending:
+                self._snapshot_writer.flush()
+            else:
+                self._write_file()
+            logging.info("Accounts journal compacted into a new snapshot.")
+
+    def _migrate_legacy_passwords(self, workers=None):
+        """
+        One-time migration of a schema 1 file: hash every plaintext password
+        in a worker pool and write the results back in atomic batches.
+        The schema version is only bumped once the last batch is written,
+        so an interrupted run simply picks up the remaining plaintext passwords.
+        """
+        # bcrypt is identified by its $2b$ prefix
+        pending = [account for account in self._accounts if not account["password"].startswith("$2b$")]
+        logging.info(f"Migrating {len(pending)} legacy password(s) to bcrypt.")
+        # bcrypt releases the GIL while hashing, so threads run the hashes in parallel
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for start in range(0, len(pending), MIGRATION_BATCH_SIZE):
+                batch = pending[start:start + MIGRATION_BATCH_SIZE]
+                hashes = pool.map(_hash_password, (account["password"] for account in batch))
+                for account, hashed_password in zip(batch, hashes):
+                    account["password"] = hashed_password
+                metrics.count("account_migration_hashes", len(batch))
+                metrics.count("account_migration_batches")
+                done = start + MIGRATION_BATCH_SIZE >= len(pending)
+                self._write_file(schema_version=SCHEMA_VERSION if done else 1)
+        if not pending:
+            self._write_file()
+        logging.info(f"Password migration complete: {len(pending)} hash(es) performed.")
+        return len(pending)
+
+    def accounts(self):
+        """Return a shallow copy of the account list (the account dicts are shared)."""
+        with self._lock:
+            self.refresh()
+            return list(self._accounts)
+
+    @timed("accounts_find")
+    def find(self, field, value):
+        """Return the account whose `field` matches `value` (case-insensitive), or None."""
+        with self._lock:
+            self.refresh()
+            return self._indexes[field].get(self._normalize(value))
+
+    def exists(self, field, value):
+        """
+        Uniqueness check. With the Bloom filter enabled a "definitely not present"
+        answer skips the index, and before the first load it also skips parsing the
+        file, as long as the persisted filter matches the file on disk.
+        """
+        with self._lock:
+            if self._bloom is None:
+                return self.find(field, value) is not None
+            if self._loaded:
+                self.refresh()
+            else:
+                signature = [list(part) if part else None for part in self._file_signature()]
+                if signature != self._bloom_signature:
+                    return self.find(field, value) is not None
+            if self._bloom_key(field, self._normalize(value)) not in self._bloom:
+                metrics.count("bloom_definite_negatives")
+                return False
+            account = self.find(field, value)
+            if account is None:
+                metrics.count("bloom_false_positives")
+            return account is not None
+
+    def add(self, account):
+        """Add a new account and persist it."""
+        self._commit({"op": "create", "account": account})
+
+    def add_many(self, accounts):
+        """Add several new accounts as a single record, so they cost one snapshot or journal write."""
+        self._commit({"op": "import", "accounts": list(accounts)})
+
+    def update(self, account, changes, unset=()):
+        """
+        Set `changes` and remove the `unset` fields on one account, persisting only that delta.
+        `account` may be a stale copy; the change is applied to the stored record by username.
+        """
+        self._commit({
+            "op": "update",
+            "username": self._normalize(account["username"]),
+            "set": changes,
+            "unset": list(unset)
+        })
+        account.update(changes)
+        for field in unset:
+            account.pop(field, None)
+
+    def update_many(self, updates):
+        """Apply several (account, changes, unset) updates as a single record, so they cost one snapshot or journal write."""
+        updates = [(account, changes, list(unset)) for account, changes, unset in updates]
+        self._commit({
+            "op": "update_many",
+            "updates": [
+                {"username": self._normalize(account["username"]), "set": changes, "unset": unset}
+                for account, changes, unset in updates
+            ]
+        })
+        for account, changes, unset in updates:
+            account.update(changes)
+            for field in unset:
+                account.pop(field, None)
+
+    def remove(self, account):
+        """Delete one account by username and persist it."""
+        self._commit({"op": "delete", "username": self._normalize(account["username"])})
+
+    def replace_all(self, accounts):
+        """Replace every account with the given list and write a full snapshot."""
+        with self._lock, self._file_lock:
+            self.refresh()
+            record = {"op": "replace", "accounts": list(accounts)}
+            self._apply(record)
+            self._unsaved.append(record)
+            self._snapshot_writer.request()
+
+def _hash_password(password):
+    return get_policy().hash(password)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Return the process-wide account backend selected by STORAGE_BACKEND, creating it on first use."""
+    global _store
+    with _store_lock:
+        if STORAGE_BACKEND == "sqlite":
+            # Imported lazily: sqlite_storage builds on the classes in this module
+            import sqlite_storage
+            if not isinstance(_store, sqlite_storage.SqliteAccountStore) or _store.file_path != sqlite_storage.DB_PATH:
+                _store = sqlite_storage.SqliteAccountStore(sqlite_storage.DB_PATH)
+        elif not isinstance(_store, AccountStore) or _store.file_path != FILE_PATH:
+            _store = AccountStore(FILE_PATH)
+        return _store
 
 # Module-level functions for account storage
 
+@timed("accounts_load")
 def load_accounts():
-    try:
-        with open(FILE_PATH, "r") as file:
-            data = json.load(file)
-            logging.info("Accounts loaded successfully.")
-            for account in data:
-                # bcrypt hashes always start with $2b$
-                if not account['password'].startswith("$2b$"):
-                    # The encoding step is necessary to convert the password (which is a string, e.g., "password123") into a byte representation (e.g., b'password123') before hashing.
-                    hashed_password = bcrypt.hashpw(account['password'].encode(), bcrypt.gensalt())
-                    # JSON only stores string data, not byte strings. So, we need to decode the hashed byte string back into a regular string
-                    account['password'] = hashed_password.decode()
-            return data if isinstance(data, list) else []
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        print("🚨 File not found! Creating a new one...")
-        logging.warning(f"File not found or could not be loaded: {e}")
-        return []
+    return get_store().accounts()
     
+@timed("accounts_save")
 def save_accounts(user_profile):
-    accounts = load_accounts()
     if not user_profile['password'].startswith("$2b$"):
-        hashed_password = bcrypt.hashpw(user_profile['password'].encode(), bcrypt.gensalt())
-        user_profile['password'] = hashed_password.decode()
-    accounts.append(user_profile)
-    with open(FILE_PATH, "w") as file:
-        json.dump(accounts, file, indent=4)
+        user_profile['password'] = _hash_password(user_profile['password'])
+    get_store().add(user_profile)
+    audit_log.record_event(audit_log.ACCOUNT_CREATED, user_profile["username"])
     logging.info(f"Account created successfully for user: {user_profile['username']}!")
     print("✅ Account created successfully!")
 
@@ -38,8 +591,7 @@ def reset_accounts_file():
     print("⚠️ The accounts file appears to be corrupted. Resetting the file will result in data loss.")
     user_confirmation = input("Are you sure you want to reset the accounts file? (y/n): ").strip().lower()
     if user_confirmation == 'y':
-        with open(FILE_PATH, "w") as file:
-            json.dump([], file, indent=4)
+        get_store().replace_all([])
         logging.info("Accounts file has been reset by user confirmation.")
         print("✅ Accounts file has been reset successfully.")
     else:
@@ -62,15 +614,29 @@ def seed_admin():
             "last name": "Admin",
             "username": "AlphaAdmin",              
             "phone number": "8735522273",
-            "password": bcrypt.hashpw("AlphaAdmin051192".encode(), bcrypt.gensalt()).decode(),
+            "password": _hash_password("AlphaAdmin051192"),
             "email": "AlphaAdmin@echo.ca",
             "role": "admin"
         }
     
-    accounts.append(admin_account)
-    
     # Save the updated accounts list
-    with open(FILE_PATH, "w") as file:
-        json.dump(accounts, file, indent=4)
+    get_store().add(admin_account)
     logging.info("Admin account created successfully!")
     print("Admin account created successfully!") #debugging purposes
+
+def export_accounts_file(path):
+    """Write every account to `path` as indented, human-readable JSON."""
+    accounts = load_accounts()
+    atomic_write_bytes(path, codec.encode_pretty(accounts))
+    logging.info(f"Exported {len(accounts)} account(s) to {path}.")
+    return len(accounts)
+
+if __name__ == "__main__":
+    # Usage: python account_storage.py [export <path>]
+    if len(sys.argv) == 3 and sys.argv[1] == "export":
+        print(f"✅ Exported {export_accounts_file(sys.argv[2])} account(s) to {sys.argv[2]}")
+        sys.exit(0)
+    # Loading the store runs the one-time legacy password migration if the file still needs it
+    metrics.enable()
+    get_store().refresh()
+    print(f"Legacy password hashes performed: {metrics.value('account_migration_hashes')}")
@@ -1,6 +1,7 @@
 import logging
 from getpass import getpass
-from account_storage import load_accounts
+from account_storage import get_store
+from metrics import timed
 
 class AccountValidator:
 
@@ -8,9 +9,9 @@ class AccountValidator:
         self.user_account = user_account # Composition: AccountValidator "has-a" user_account
 
     # Validation for uniqueness
+    @timed("validator_is_unique")
     def is_unique(self, key, value):
-        accounts = load_accounts()
-        if any(account[key].lower() == value.lower() for account in accounts):
+        if get_store().exists(key, value):
             print(f"⚠️ This {key} is already taken. Please choose a different one.")
             logging.warning(f"Duplicate {key} found: {value}")
             return False
@@ -0,0 +1,117 @@
+import os, queue, atexit, logging, threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from metrics import count
+
+# Activity log written by the background listener thread
+LOG_FILE_PATH = os.environ.get("ACTIVITY_LOG_PATH", "user_activity.log")
+LOG_FORMAT = "%(asctime)s:%(levelname)s:%(message)s"
+LOG_DATE_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+
+# Records waiting to be written; callers never touch the file themselves
+LOG_QUEUE_SIZE = int(os.environ.get("ACTIVITY_LOG_QUEUE_SIZE", "10000"))
+
+# What happens when the queue is full:
+# "block" waits for room (nothing is lost), "drop_oldest" discards the oldest queued record,
+# "sample" keeps only every LOG_SAMPLE_EVERY-th record below WARNING once the queue is half full.
+BLOCK, DROP_OLDEST, SAMPLE = "block", "drop_oldest", "sample"
+LOG_OVERFLOW_POLICY = os.environ.get("ACTIVITY_LOG_OVERFLOW", DROP_OLDEST)
+LOG_SAMPLE_EVERY = int(os.environ.get("ACTIVITY_LOG_SAMPLE_EVERY", "10"))
+
+# "size" rotates at LOG_MAX_BYTES, "time" rotates at LOG_ROTATE_WHEN (e.g. "midnight"), "none" never rotates
+LOG_ROTATION = os.environ.get("ACTIVITY_LOG_ROTATION", "size")
+LOG_MAX_BYTES = int(os.environ.get("ACTIVITY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_ROTATE_WHEN = os.environ.get("ACTIVITY_LOG_ROTATE_WHEN", "midnight")
+LOG_BACKUP_COUNT = int(os.environ.get("ACTIVITY_LOG_BACKUP_COUNT", "5"))
+
+# Records lost to the overflow policy are counted in the metrics registry
+# as activity_log_dropped and activity_log_sampled_out
+
+# ------------------ BoundedQueueHandler Class ------------------
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler whose bounded queue applies an overflow policy instead of raising queue.Full."""
+
+    def __init__(self, log_queue, policy=None, sample_every=None):
+        super().__init__(log_queue)
+        self.policy = policy or LOG_OVERFLOW_POLICY
+        self.sample_every = sample_every or LOG_SAMPLE_EVERY
+        self._sample_count = 0
+        self._lock = threading.Lock()
+
+    def enqueue(self, record):
+        if self.policy == BLOCK:
+            self.queue.put(record)
+            return
+        if self.policy == SAMPLE and record.levelno < logging.WARNING \
+                and self.queue.qsize() >= self.queue.maxsize // 2:
+            with self._lock:
+                self._sample_count += 1
+                if self._sample_count % self.sample_every:
+                    count("activity_log_sampled_out")
+                    return
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            if self.policy != DROP_OLDEST:
+                count("activity_log_dropped")
+                return
+        with self._lock:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            count("activity_log_dropped")
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                count("activity_log_dropped")
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room so stop() works even while the queue is full
+        self.queue.put(self._sentinel)
+
+# ------------------ Setup ------------------
+_listener = None
+_handler = None
+_setup_lock = threading.Lock()
+
+def _file_handler(path, rotation):
+    if rotation == "size":
+        return RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    if rotation == "time":
+        return TimedRotatingFileHandler(path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    return logging.FileHandler(path, encoding="utf-8")
+
+def setup_activity_logging(path=None, level=logging.INFO, policy=None, rotation=None):
+    """
+    Route the root logger (and so helper.log_info/log_warning/log_error) through a bounded queue.
+    A listener thread writes the records to the activity log, so logging callers never wait on file I/O.
+    Calling it again replaces the previous setup.
+    """
+    global _listener, _handler
+    with _setup_lock:
+        stop_activity_logging()
+        file_handler = _file_handler(path or LOG_FILE_PATH, rotation or LOG_ROTATION)
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        _handler = BoundedQueueHandler(log_queue, policy)
+        _listener = _Listener(log_queue, file_handler, respect_handler_level=True)
+        root = logging.getLogger()
+        root.addHandler(_handler)
+        root.setLevel(level)
+        _listener.start()
+        return _listener
+
+@atexit.register
+def stop_activity_logging():
+    """Write every queued record, then stop the listener thread."""
+    global _listener, _handler
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,522 @@
+# api_server.py
+# Headless HTTP/JSON API over the account and to-do logic, for services and load tests.
+# Built on asyncio streams (stdlib only): connections are kept alive, pipelined requests
+# are answered in order, bcrypt runs in auth's bounded hash pool and store/to-do calls in a
+# bounded store pool, so the event loop itself never waits on a hash, a file read or an fsync.
+import os, re, sys, json, asyncio, logging, functools, threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs, unquote
+from account_storage import get_store, DuplicateAccountError
+from profile_validation import (
+    UNIQUE_FIELDS, normalize_profile, validate_profile, validate_name,
+    validate_phone_number, validate_password, validate_email)
+from session_manager import get_session_manager
+from account_search import search_accounts as search_index, list_accounts
+from lock_scheduler import get_lock_scheduler
+from to_do_list import UserToDoList
+import auth
+import audit_log
+from metrics import timer, count
+
+# Address the server listens on
+API_HOST = os.environ.get("API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("API_PORT", "8080"))
+
+# Largest accepted request body, and how long an idle keep-alive connection stays open
+API_MAX_BODY_BYTES = int(os.environ.get("API_MAX_BODY_BYTES", 64 * 1024))
+API_KEEPALIVE_SECONDS = float(os.environ.get("API_KEEPALIVE_SECONDS", "15"))
+
+# Threads running store and to-do calls (lookups, snapshot rewrites, fsyncs) off the event loop;
+# the pool is also the loop's default executor, which auth.authenticate_async uses for its store work
+API_STORE_WORKERS = int(os.environ.get("API_STORE_WORKERS", "4"))
+_store_executor = ThreadPoolExecutor(max_workers=API_STORE_WORKERS, thread_name_prefix="store")
+
+# To-do requests of one user are serialized (load, change, record) by one of these striped locks
+_task_locks = [threading.Lock() for _ in range(64)]
+
+# Profile fields a user may change through PATCH /profile, with the prompt-equivalent cleanup
+EDITABLE_FIELDS = {
+    "first name": lambda value: value.strip().title(),
+    "last name": lambda value: value.strip().title(),
+    "phone number": lambda value: value.strip(),
+    "email": lambda value: value.strip().lower(),
+    "password": lambda value: value.strip()
+}
+
+# ------------------ Requests and Errors ------------------
+class HttpError(Exception):
+    """Raised by a handler to answer with an error status and a JSON {"error": ..., "errors": [...]} body."""
+
+    def __init__(self, status, message, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.errors = errors
+
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body", "peer", "session")
+
+    def __init__(self, method, target, headers, body, peer):
+        url = urlsplit(target)
+        self.method = method
+        self.path = unquote(url.path)
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.headers = headers
+        self.body = body
+        self.peer = peer
+        self.session = None
+
+    def json(self):
+        """The body as a JSON object ({} if empty)."""
+        if not self.body:
+            return {}
+        try:
+            payload = json.loads(self.body)
+        except ValueError:
+            raise HttpError(400, "The request body is not valid JSON.")
+        if not isinstance(payload, dict):
+            raise HttpError(400, "The request body must be a JSON object.")
+        return payload
+
+    @property
+    def token(self):
+        scheme, _, token = self.headers.get("authorization", "").partition(" ")
+        return token.strip() if scheme.lower() == "bearer" else None
+
+# ------------------ Routing ------------------
+_routes = []  # (method, compiled path pattern, handler, needs a session, needs admin)
+
+def route(method, path, login=True, admin=False):
+    """Register a handler for `method` and `path`; "{name}" path segments are passed as keyword arguments."""
+    pattern = re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", path) + "$")
+
+    def decorator(handler):
+        _routes.append((method, pattern, handler, login or admin, admin))
+        return handler
+    return decorator
+
+def _resolve(request):
+    allowed = []
+    for method, pattern, handler, login, admin in _routes:
+        match = pattern.match(request.path)
+        if match is None:
+            continue
+        if method != request.method:
+            allowed.append(method)
+            continue
+        return handler, match.groupdict(), login, admin
+    if allowed:
+        raise HttpError(405, f"Use {' or '.join(allowed)} for {request.path}.")
+    raise HttpError(404, f"No endpoint at {request.path}.")
+
+def _authorize(request, admin):
+    """The caller's live session; its account is re-read so removed accounts lose access at once."""
+    session = get_session_manager().validate(request.token) if request.token else None
+    if session is None:
+        raise HttpError(401, "Log in first (Authorization: Bearer <token>).")
+    account = get_store().find("username", session.username)
+    if account is None:
+        get_session_manager().revoke_user(session.username)
+        raise HttpError(401, "This account no longer exists.")
+    session.account = account
+    if admin and not session.is_admin:
+        raise HttpError(403, "Admins only.")
+    return session
+
+def public_profile(account):
+    """The account without its password hash."""
+    return {key: value for key, value in account.items() if key != "password"}
+
+async def blocking(function, *args, **kwargs):
+    """Run a blocking store or to-do call in the store pool and wait for it without blocking the loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_store_executor, functools.partial(function, *args, **kwargs))
+
+def _priority(value):
+    """A task priority from the body: a whole number (or a string of one), 0 if missing."""
+    if value is None or value == "":
+        return 0
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise HttpError(422, "Priority must be a whole number.")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HttpError(422, "Priority must be a whole number.")
+
+def _task_id(value):
+    # isascii() keeps out the non-ASCII digits int() would otherwise accept, like "٣"
+    try:
+        if value.isascii():
+            return int(value)
+    except (TypeError, ValueError):
+        pass
+    raise HttpError(404, f"No task {value}.")
+
+def _taken(field, value, username=None):
+    """True if another account than `username` already uses `value` for `field`."""
+    account = get_store().find(field, value)
+    return account is not None and (username is None or account["username"].lower() != username.lower())
+
+def _taken_fields(profile, username=None):
+    return [field for field in UNIQUE_FIELDS if field in profile and _taken(field, profile[field], username)]
+
+def _taken_error(taken):
+    return HttpError(409, "Already taken.", [f"⚠️ This {field} is already taken." for field in taken])
+
+def _create_account(profile):
+    """Add the account unless another request took one of its unique values meanwhile; returns the taken fields."""
+    store = get_store()
+    with store.locked():
+        taken = _taken_fields(profile)
+        if not taken:
+            try:
+                store.add(profile)
+            except DuplicateAccountError as e:
+                # Another process took a value after the check
+                taken = e.fields
+    return taken
+
+def _update_profile(account, changes):
+    """Apply the changes unless another account took one of their unique values meanwhile; returns the taken fields."""
+    store = get_store()
+    with store.locked():
+        taken = _taken_fields(changes, account["username"])
+        if not taken:
+            try:
+                store.update(account, changes)
+            except DuplicateAccountError as e:
+                taken = e.fields
+    return taken
+
+def _unlock_account(username):
+    store = get_store()
+    with store.locked():
+        account = store.find("username", username)
+        if account is not None and account.get("is_locked"):
+            store.update(account, {"is_locked": False}, unset=("lock_time",))
+            return account
+    return None
+
+def _remove_account(username):
+    store = get_store()
+    with store.locked():
+        account = store.find("username", username)
+        if account is not None:
+            store.remove(account)
+    return account
+
+def _change_tasks(username, change):
+    """Load the user's TaskList, apply change(tasks) and record the operations it made; returns change's result."""
+    with _task_locks[hash(username) % len(_task_locks)]:
+        tasks = UserToDoList.load_task_list(username)
+        result = change(tasks)
+        UserToDoList.record_changes(username, tasks)
+        return result
+
+# ------------------ Account Endpoints ------------------
+@route("POST", "/register", login=False)
+async def register(request):
+    profile = normalize_profile(request.json())
+    # Self-registration always creates a regular user with a password chosen now
+    profile["role"] = "user"
+    errors = validate_profile(profile)
+    if profile["password"].startswith("$2b$"):
+        errors += validate_password(profile["password"])
+    if errors:
+        raise HttpError(422, "The profile is not valid.", errors)
+    taken = await blocking(_taken_fields, profile)
+    if taken:
+        raise _taken_error(taken)
+    profile["password"] = await auth.hash_password_async(profile["password"])
+    now = datetime.now().isoformat()
+    profile.update({"is_locked": False, "date_created": now, "date_modified": now})
+    # Checked again under the store lock: another request may have registered the same values meanwhile
+    taken = await blocking(_create_account, profile)
+    if taken:
+        raise _taken_error(taken)
+    audit_log.record_event(audit_log.ACCOUNT_CREATED, profile["username"], source="api")
+    logging.info(f"Account created via the API for user: {profile['username']}.")
+    return 201, public_profile(profile)
+
+@route("POST", "/login", login=False)
+async def login(request):
+    body = request.json()
+    username, password = str(body.get("username") or ""), str(body.get("password") or "")
+    if not username or not password:
+        raise HttpError(400, "Send a username and a password.")
+    status, account = await auth.authenticate_async(username, password, source=request.peer)
+    if status == auth.AUTH_THROTTLED:
+        raise HttpError(429, "Too many login attempts. Please wait a minute and try again.")
+    if status == auth.AUTH_LOCKED:
+        raise HttpError(423, "This account is locked. Please contact the admin.")
+    if status != auth.AUTH_OK:
+        raise HttpError(401, "Invalid username or password.")
+    sessions = get_session_manager()
+    token = sessions.issue(account)
+    return 200, {"token": token, "expires": sessions.validate(token).expires, "profile": public_profile(account)}
+
+@route("POST", "/logout")
+async def logout(request):
+    get_session_manager().revoke(request.token)
+    audit_log.record_event(audit_log.LOGOUT, request.session.username, source="api")
+    return 204, None
+
+@route("GET", "/profile")
+async def view_profile(request):
+    return 200, public_profile(request.session.account)
+
+@route("PATCH", "/profile")
+async def edit_profile(request):
+    account = request.session.account
+    body = request.json()
+    unknown = sorted(set(body) - set(EDITABLE_FIELDS))
+    if unknown or not body:
+        raise HttpError(400, f"Only these fields can be edited: {', '.join(EDITABLE_FIELDS)}.")
+    changes = {field: EDITABLE_FIELDS[field](str(value)) for field, value in body.items()}
+    validators = {
+        "first name": lambda value: validate_name("First name", value),
+        "last name": lambda value: validate_name("Last name", value),
+        "phone number": validate_phone_number,
+        "email": validate_email,
+        "password": validate_password
+    }
+    errors = [error for field, value in changes.items() for error in validators[field](value)]
+    if errors:
+        raise HttpError(422, "The changes are not valid.", errors)
+    if "password" in changes:
+        changes["password"] = await auth.hash_password_async(changes["password"])
+    changes["date_modified"] = datetime.now().isoformat()
+    taken = await blocking(_update_profile, account, changes)
+    if taken:
+        raise _taken_error(taken)
+    audit_log.record_event(audit_log.PROFILE_UPDATED, account["username"], fields=sorted(changes), source="api")
+    return 200, public_profile(account)
+
+@route("DELETE", "/profile")
+async def delete_profile(request):
+    account = request.session.account
+    await blocking(get_store().remove, account)
+    get_session_manager().revoke_user(account["username"])
+    audit_log.record_event(audit_log.ACCOUNT_REMOVED, account["username"], source="api")
+    logging.info(f"Account deleted via the API for user: {account['username']}.")
+    return 204, None
+
+# ------------------ Admin Endpoints ------------------
+@route("GET", "/admin/accounts", admin=True)
+async def search_accounts(request):
+    """
+    ?username=<exact username>, or a search: q, field (username/email/name), mode (prefix/substring),
+    role, locked (true/false), created_from, created_to, offset and limit (max 100).
+    """
+    query = request.query
+    username = query.get("username")
+    if username:
+        account = await blocking(get_store().find, "username", username)
+        return 200, {"accounts": [public_profile(account)] if account else [], "next_offset": None}
+    try:
+        offset, limit = int(query.get("offset", 0)), min(int(query.get("limit", 20)), 100)
+        page, next_offset = await blocking(
+            search_index, query.get("q"), field=query.get("field"), mode=query.get("mode", "prefix"),
+            role=query.get("role"), is_locked={"true": True, "false": False}.get(query.get("locked")),
+            created_from=query.get("created_from"), created_to=query.get("created_to"),
+            offset=max(offset, 0), limit=max(limit, 1))
+    except ValueError as e:
+        raise HttpError(400, str(e))
+    return 200, {"accounts": [public_profile(account) for account in page], "next_offset": next_offset}
+
+@route("GET", "/admin/list", admin=True)
+async def list_all_accounts(request):
+    """?cursor=<next_cursor of the previous page>, limit (max 100), fields=username,email,..., sort, order=asc|desc."""
+    query = request.query
+    fields = [field.strip() for field in query["fields"].split(",")] if query.get("fields") else None
+    try:
+        limit = max(1, min(int(query.get("limit", 20)), 100))
+        records, next_cursor = await blocking(list_accounts, query.get("cursor"), limit, fields,
+                                              query.get("sort", "username"), query.get("order") == "desc")
+    except ValueError as e:
+        raise HttpError(400, str(e))
+    return 200, {"accounts": records, "next_cursor": next_cursor}
+
+@route("GET", "/admin/locked", admin=True)
+async def list_locked_accounts(request):
+    """The currently locked usernames, soonest unlock first."""
+    return 200, {"usernames": await blocking(get_lock_scheduler().locked_usernames)}
+
+@route("GET", "/admin/accounts/{username}", admin=True)
+async def view_account(request, username):
+    account = await blocking(get_store().find, "username", username)
+    if account is None:
+        raise HttpError(404, f"No account named {username}.")
+    return 200, public_profile(account)
+
+@route("POST", "/admin/accounts/{username}/unlock", admin=True)
+async def unlock_account(request, username):
+    account = await blocking(_unlock_account, username)
+    if account is None:
+        raise HttpError(404, f"{username} is not a locked account.")
+    audit_log.record_event(audit_log.ACCOUNT_UNLOCKED, account["username"], by="admin", source="api")
+    return 200, public_profile(account)
+
+@route("DELETE", "/admin/accounts/{username}", admin=True)
+async def remove_account(request, username):
+    account = await blocking(_remove_account, username)
+    if account is None:
+        raise HttpError(404, f"No account named {username}.")
+    get_session_manager().revoke_user(account["username"])
+    audit_log.record_event(audit_log.ACCOUNT_REMOVED, account["username"], by="admin", source="api")
+    return 204, None
+
+# ------------------ To-Do Endpoints ------------------
+# Each change runs as one load/change/record step in the store pool under the user's task lock,
+# so two requests of the same user never interleave on one list.
+@route("GET", "/todos")
+async def list_tasks(request):
+    tasks = await blocking(UserToDoList.load_task_list, request.session.username)
+    return 200, {"tasks": tasks.to_records()}
+
+@route("POST", "/todos")
+async def add_task(request):
+    body = request.json()
+    text = str(body.get("text") or "").strip()
+    if not text:
+        raise HttpError(422, "Task cannot be empty.")
+    username, priority = request.session.username, _priority(body.get("priority"))
+    task = await blocking(_change_tasks, username, lambda tasks: tasks.add(text, priority=priority))
+    if task is None:
+        raise HttpError(409, f"'{text}' is already in your list.")
+    audit_log.record_event(audit_log.TASK_ADDED, username, task_id=task.id, source="api")
+    return 201, task.to_dict()
+
+@route("POST", "/todos/{task_id}/complete")
+async def complete_task(request, task_id):
+    username, task_id = request.session.username, _task_id(task_id)
+    task = await blocking(_change_tasks, username, lambda tasks: tasks.complete(task_id))
+    if task is None:
+        raise HttpError(404, f"No task {task_id}.")
+    audit_log.record_event(audit_log.TASK_COMPLETED, username, task_id=task.id, source="api")
+    return 200, task.to_dict()
+
+@route("DELETE", "/todos/{task_id}")
+async def remove_task(request, task_id):
+    username, task_id = request.session.username, _task_id(task_id)
+    task = await blocking(_change_tasks, username, lambda tasks: tasks.remove(task_id))
+    if task is None:
+        raise HttpError(404, f"No task {task_id}.")
+    audit_log.record_event(audit_log.TASK_REMOVED, username, task_id=task.id, source="api")
+    return 204, None
+
+# ------------------ HTTP/1.1 Connection Handling ------------------
+async def _read_request(reader, peer):
+    """Read one request off the connection; None once the client closed it."""
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), API_KEEPALIVE_SECONDS)
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(431, "Request headers are too large.")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ")
+    except ValueError:
+        raise HttpError(400, "Malformed request line.")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HttpError(411, "Send a Content-Length instead of a chunked body.")
+    length = headers.get("content-length", "0")
+    if not length.isdigit():
+        raise HttpError(400, "Invalid Content-Length.")
+    if int(length) > API_MAX_BODY_BYTES:
+        raise HttpError(413, f"The body is larger than {API_MAX_BODY_BYTES} bytes.")
+    body = await reader.readexactly(int(length)) if int(length) else b""
+    request = Request(method.upper(), target, headers, body, peer)
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+    return request, keep_alive
+
+def _response(status, payload, keep_alive):
+    body = b"" if payload is None else json.dumps(payload).encode()
+    head = [
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}"
+    ]
+    if body:
+        head.append("Content-Type: application/json")
+    return ("\r\n".join(head) + "\r\n\r\n").encode() + body
+
+def _error_response(error):
+    payload = {"error": error.message}
+    if error.errors:
+        payload["errors"] = error.errors
+    return error.status, payload
+
+async def _handle(request):
+    """Run the request's handler; returns (status, payload)."""
+    try:
+        handler, params, login, admin = _resolve(request)
+        if login:
+            request.session = await blocking(_authorize, request, admin)
+        return await handler(request, **params)
+    except DuplicateAccountError as e:
+        # A write lost a race for a unique value against another process
+        return _error_response(_taken_error(e.fields))
+    except HttpError as e:
+        return _error_response(e)
+    except Exception as e:
+        logging.exception(f"API error on {request.method} {request.path}: {e}")
+        return 500, {"error": "Internal server error."}
+
+async def handle_connection(reader, writer):
+    """
+    Serve one keep-alive connection. Requests are read and answered one after another,
+    so pipelined requests get their responses in the order they were sent.
+    """
+    peer = (writer.get_extra_info("peername") or ("unknown",))[0]
+    try:
+        while True:
+            try:
+                parsed = await _read_request(reader, peer)
+            except HttpError as e:
+                writer.write(_response(e.status, {"error": e.message}, False))
+                break
+            if parsed is None:
+                break
+            request, keep_alive = parsed
+            with timer("api_request"):
+                status, payload = await _handle(request)
+            count(f"api_status_{status}")
+            writer.write(_response(status, payload, keep_alive))
+            if not keep_alive:
+                break
+            await writer.drain()
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(host=None, port=None):
+    """Run the API server until cancelled."""
+    asyncio.get_running_loop().set_default_executor(_store_executor)
+    # Expired lockouts are released in the background while the server runs
+    await blocking(get_lock_scheduler)
+    server = await asyncio.start_server(handle_connection, host or API_HOST, port or API_PORT)
+    address = server.sockets[0].getsockname()
+    logging.info(f"API server listening on {address[0]}:{address[1]}.")
+    print(f"🌐 API server listening on http://{address[0]}:{address[1]}")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    # Usage: python api_server.py [port]
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(port=int(sys.argv[1]) if len(sys.argv) > 1 else None))
+    except KeyboardInterrupt:
+        print("\n👋 API server stopped.")
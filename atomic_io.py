@@ -0,0 +1,155 @@
+import os, json, atexit, logging, tempfile, threading, weakref
+import codec
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Writes requested within this many milliseconds of each other are coalesced into one.
+# 0 writes (and fsyncs) every change straight away.
+WRITE_COALESCE_MS = int(os.environ.get("WRITE_COALESCE_MS", "0"))
+
+# ------------------ Atomic Writes ------------------
+def atomic_write_json(path, payload, indent=None):
+    """Atomically replace `path` with `payload` serialized as JSON (compact unless `indent` is given)."""
+    separators = None if indent else (",", ":")
+    atomic_write_bytes(path, json.dumps(payload, indent=indent, separators=separators).encode())
+
+def atomic_write_encoded(path, payload, fmt=None):
+    """Atomically replace `path` with `payload` in a codec format (default codec.STORAGE_FORMAT)."""
+    atomic_write_bytes(path, codec.encode(payload, fmt))
+
+def atomic_write_bytes(path, data):
+    """
+    Write `data` to a temp file next to `path`, fsync it and swap it into place with os.replace.
+    A crash leaves either the old file or the new one, never a truncated mix of both.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    fsync_directory(directory)
+
+def fsync_directory(directory):
+    """Persist a rename inside `directory` (a no-op where directories can't be opened, e.g. Windows)."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def fsync_path(path):
+    """fsync an existing file, e.g. after appending to it."""
+    with open(path, "rb") as file:
+        os.fsync(file.fileno())
+
+# ------------------ FileLock Class ------------------
+class FileLock:
+    """
+    Advisory exclusive lock on `<path>.lock`, honoured by every process using the file.
+    Re-entrant within a process, so nested read-modify-write cycles don't deadlock.
+    """
+
+    def __init__(self, path):
+        self.lock_path = path + ".lock"
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            self._file = open(self.lock_path, "a+")
+            if fcntl:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+def file_lock(path):
+    """Return the process-wide FileLock for `path`."""
+    key = os.path.abspath(path)
+    with _file_locks_guard:
+        if key not in _file_locks:
+            _file_locks[key] = FileLock(key)
+        return _file_locks[key]
+
+# ------------------ GroupCommitWriter Class ------------------
+_writers = weakref.WeakSet()
+
+class GroupCommitWriter:
+    """
+    Coalesces write requests that arrive within `window_ms` of each other
+    into a single call of `write`, which must persist the *current* state.
+    With a window of 0 every request calls `write` immediately.
+    """
+
+    def __init__(self, write, window_ms=None):
+        self._write = write
+        self.window_ms = WRITE_COALESCE_MS if window_ms is None else window_ms
+        self._lock = threading.Lock()
+        self._timer = None
+        _writers.add(self)
+
+    @property
+    def pending(self):
+        """True while a coalesced write is waiting for its window to close."""
+        return self._timer is not None
+
+    def request(self):
+        if self.window_ms <= 0:
+            self._write()
+            return
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.window_ms / 1000, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Run the pending write now (if any)."""
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is None:
+            return
+        timer.cancel()
+        try:
+            self._write()
+        except Exception as e:
+            logging.error(f"Coalesced write failed: {e}")
+            raise
+
+@atexit.register
+def flush_all():
+    """Run every pending coalesced write, e.g. before the process exits."""
+    for writer in list(_writers):
+        writer.flush()
@@ -0,0 +1,234 @@
+import os, sys, json, time, queue, atexit, struct, hashlib, logging, threading
+from collections import Counter
+from datetime import datetime
+from atomic_io import file_lock
+from activity_log import LOG_FILE_PATH
+
+# JSON-lines file with one structured record per auth, profile and to-do event
+AUDIT_FILE_PATH = os.environ.get("AUDIT_LOG_PATH", os.path.splitext(LOG_FILE_PATH)[0] + "_audit.jsonl")
+
+# Event types
+LOGIN = "login"
+LOGOUT = "logout"
+ACCOUNT_CREATED = "account_created"
+ACCOUNT_REMOVED = "account_removed"
+ACCOUNT_LOCKED = "account_locked"
+ACCOUNT_UNLOCKED = "account_unlocked"
+PROFILE_UPDATED = "profile_updated"
+PASSWORD_RESET = "password_reset"
+TASK_ADDED = "task_added"
+TASK_REMOVED = "task_removed"
+TASK_COMPLETED = "task_completed"
+
+# Outcomes
+SUCCESS = "success"
+FAILURE = "failure"
+
+# ------------------ AuditLog Class ------------------
+class AuditLog:
+    """
+    Append-only JSON-lines audit file plus a fixed-width binary index next to it.
+    Each index entry is (timestamp, byte offset of the record, username hash); entries are
+    in timestamp order, so a time range is found by binary search over the index and the
+    matching records are read by seeking into the audit file, and a per-user query only
+    scans the 24-byte index entries instead of the JSON records.
+    """
+
+    ENTRY = struct.Struct("<dQQ")
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.index_path = file_path + ".idx"
+        self._lock = threading.RLock()
+        self._file_lock = file_lock(file_path)
+        self._last_ts = 0.0
+        self._repaired = False
+
+    @staticmethod
+    def user_key(username):
+        if username is None:
+            return 0
+        return int.from_bytes(hashlib.blake2b(username.strip().lower().encode(), digest_size=8).digest(), "little")
+
+    def _repair(self):
+        """Bring the index up to date with the audit file after a crash between the two appends."""
+        if not os.path.exists(self.file_path):
+            return
+        with open(self.index_path, "a+b") as index:
+            size = index.seek(0, os.SEEK_END)
+            size -= size % self.ENTRY.size
+            index.truncate(size)
+            offset = 0
+            if size:
+                index.seek(size - self.ENTRY.size)
+                self._last_ts, offset, _ = self.ENTRY.unpack(index.read(self.ENTRY.size))
+            with open(self.file_path, "rb") as audit:
+                audit.seek(offset)
+                if size:
+                    offset += len(audit.readline())  # already indexed
+                for line in iter(audit.readline, b""):
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    self._last_ts = max(self._last_ts, record["ts"])
+                    index.write(self.ENTRY.pack(self._last_ts, offset, self.user_key(record.get("username"))))
+                    offset += len(line)
+
+    def append(self, record):
+        """Write one event record and its index entry."""
+        with self._lock, self._file_lock:
+            if not self._repaired:
+                self._repair()
+                self._repaired = True
+            with open(self.index_path, "a+b") as index, open(self.file_path, "a+b") as audit:
+                # Timestamps never go backwards in the file (whichever process wrote last), which keeps the index sorted
+                end = index.seek(0, os.SEEK_END)
+                if end:
+                    index.seek(end - self.ENTRY.size)
+                    self._last_ts = max(self._last_ts, self.ENTRY.unpack(index.read(self.ENTRY.size))[0])
+                record["ts"] = self._last_ts = max(record["ts"], self._last_ts)
+                offset = audit.seek(0, os.SEEK_END)
+                if offset:
+                    audit.seek(offset - 1)
+                    if audit.read(1) != b"\n":
+                        # Close a torn line left by a crash so this record starts on its own line
+                        audit.write(b"\n")
+                        offset += 1
+                audit.write((json.dumps(record) + "\n").encode())
+                index.write(self.ENTRY.pack(record["ts"], offset, self.user_key(record.get("username"))))
+
+    def _entries(self, index, first, last):
+        index.seek(first * self.ENTRY.size)
+        for _ in range(first, last):
+            yield self.ENTRY.unpack(index.read(self.ENTRY.size))
+
+    def _bisect(self, index, count, ts):
+        """Position of the first index entry with a timestamp >= ts."""
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            index.seek(middle * self.ENTRY.size)
+            if self.ENTRY.unpack(index.read(self.ENTRY.size))[0] < ts:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def query(self, start=None, end=None, username=None, event=None, outcome=None, limit=None):
+        """
+        Yield the event records with start <= ts < end (epoch seconds), oldest first,
+        optionally only those of one username, event type and/or outcome.
+        """
+        user_key = self.user_key(username) if username is not None else None
+        with self._lock, self._file_lock:
+            if not self._repaired:
+                self._repair()
+                self._repaired = True
+            try:
+                with open(self.index_path, "rb") as index:
+                    count = index.seek(0, os.SEEK_END) // self.ENTRY.size
+                    first = self._bisect(index, count, start) if start is not None else 0
+                    last = self._bisect(index, count, end) if end is not None else count
+                    offsets = [offset for _, offset, key in self._entries(index, first, last)
+                               if user_key is None or key == user_key]
+            except FileNotFoundError:
+                return
+        # Records are never rewritten, so they can be read without holding the locks
+        with open(self.file_path, "rb") as audit:
+            found = 0
+            for offset in offsets:
+                audit.seek(offset)
+                record = json.loads(audit.readline())
+                if username is not None and (record.get("username") or "").lower() != username.strip().lower():
+                    continue
+                if (event and record["event"] != event) or (outcome and record["outcome"] != outcome):
+                    continue
+                yield record
+                found += 1
+                if limit and found >= limit:
+                    return
+
+_audit_log = None
+_audit_log_lock = threading.Lock()
+
+def get_audit_log():
+    """Return the process-wide audit log for AUDIT_FILE_PATH, creating it on first use."""
+    global _audit_log
+    with _audit_log_lock:
+        if _audit_log is None or _audit_log.file_path != AUDIT_FILE_PATH:
+            _audit_log = AuditLog(AUDIT_FILE_PATH)
+        return _audit_log
+
+# ------------------ Recording Events ------------------
+# Events are written by a background thread, like the activity log, so callers never wait on the files
+_events = queue.Queue()
+_writer_thread = None
+
+def _write_events():
+    while True:
+        record = _events.get()
+        try:
+            get_audit_log().append(record)
+        except Exception as e:
+            # Any failure (a full disk, a detail that isn't JSON serializable) drops only this event;
+            # the writer keeps running so flush_events() never waits forever
+            logging.error(f"Could not write audit event {record['event']} for {record['username']}: {e}")
+        finally:
+            _events.task_done()
+
+@atexit.register
+def flush_events():
+    """Wait until every recorded event is written."""
+    if _writer_thread is not None:
+        _events.join()
+
+def record_event(event, username=None, outcome=SUCCESS, **details):
+    """Record one structured activity event (event type, username, timestamp, outcome and details)."""
+    global _writer_thread
+    now = time.time()
+    record = {
+        "ts": now,
+        "time": datetime.fromtimestamp(now).isoformat(),
+        "event": event,
+        "username": username,
+        "outcome": outcome
+    }
+    if details:
+        record["details"] = details
+    if _writer_thread is None:
+        with _audit_log_lock:
+            if _writer_thread is None:
+                _writer_thread = threading.Thread(target=_write_events, name="audit-writer", daemon=True)
+                _writer_thread.start()
+    _events.put(record)
+
+# ------------------ Admin Queries ------------------
+def query_events(since=None, until=None, username=None, event=None, outcome=None, limit=None):
+    """Return the events between two epoch timestamps (default: all), oldest first."""
+    flush_events()
+    return list(get_audit_log().query(since, until, username, event, outcome, limit))
+
+def recent_events(seconds, **filters):
+    """Return the events of the last `seconds` seconds."""
+    return query_events(since=time.time() - seconds, **filters)
+
+def top_users(event, outcome=None, seconds=None, n=10):
+    """
+    Usernames with the most `event` records (optionally of one outcome) in the last `seconds`,
+    e.g. top_users(LOGIN, FAILURE, 3600) answers "who failed login most in the last hour".
+    """
+    since = time.time() - seconds if seconds else None
+    flush_events()
+    counts = Counter(record["username"] for record in get_audit_log().query(since, None, None, event, outcome))
+    return counts.most_common(n)
+
+if __name__ == "__main__":
+    # Usage: python audit_log.py [username] [hours]
+    username = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] != "-" else None
+    hours = float(sys.argv[2]) if len(sys.argv) > 2 else 24
+    for record in recent_events(hours * 3600, username=username):
+        print(f"{record['time']} {record['event']} {record['username']} {record['outcome']} {record.get('details', '')}")
+    print("\nMost failed logins:")
+    for name, count in top_users(LOGIN, FAILURE, hours * 3600):
+        print(f"- {name}: {count}")
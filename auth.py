@@ -1,17 +1,149 @@
 # auth.py
-import bcrypt
+import os, asyncio, logging
+from concurrent.futures import ThreadPoolExecutor
 from getpass import getpass
-from datetime import datetime
-from account_storage import load_accounts
+from account_storage import load_accounts, get_store
+from password_policy import get_policy
+import audit_log
+from metrics import timed, count
+from lock_scheduler import get_lock_scheduler
+from rate_limiter import (
+    TokenBucketLimiter, LockoutTracker,
+    USER_ATTEMPTS_PER_MINUTE, SOURCE_ATTEMPTS_PER_MINUTE)
 from helper import (
     log_info, log_warning, log_error,
-    update_accounts_file, auto_unlock_account,
+    update_account,
     reset_password)
 
+# bcrypt releases the GIL while hashing, so this pool verifies several logins in parallel.
+# It is bounded so a burst of logins queues up instead of spawning a thread per request.
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", os.cpu_count() or 4))
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+
+# Outcomes of authenticate()
+AUTH_OK = "ok"
+AUTH_NOT_FOUND = "not_found"
+AUTH_LOCKED = "locked"
+AUTH_BAD_PASSWORD = "bad_password"
+AUTH_THROTTLED = "throttled"
+
+# Process-wide login throttling; checked before any lookup or bcrypt work
+user_limiter = TokenBucketLimiter(USER_ATTEMPTS_PER_MINUTE)
+source_limiter = TokenBucketLimiter(SOURCE_ATTEMPTS_PER_MINUTE)
+lockouts = LockoutTracker()
+
+# ------------------ Non-interactive Core ------------------
+def find_login_account(username):
+    """Return the account for `username` (case-sensitive, like the login prompt), or None."""
+    username = username.strip()
+    # O(1) index lookup; the username match itself stays case-sensitive
+    account = get_store().find("username", username)
+    if account and account["username"].strip() != username:
+        return None
+    return account
+
+def is_locked_out(account):
+    """
+    True if a non-admin account is locked. Expired locks are released by the lock
+    scheduler's background thread; one it hasn't reached yet is unlocked (and persisted) here.
+    """
+    if account.get("role", "user").lower() == "admin" or not account.get("is_locked", False):
+        return False
+    return not get_lock_scheduler().unlock_if_expired(account)
+
+def check_password(password, hashed_password):
+    return get_policy().verify(password, hashed_password)
+
+def hash_password(password):
+    return get_policy().hash(password)
+
+def _rehash(account, password, old_hash):
+    try:
+        new_hash = hash_password(password)
+        # Skip if the password changed (e.g. a reset) while the new hash was computed
+        if account["password"] == old_hash:
+            update_account(account, {"password": new_hash}, log_message=f"Password re-hashed for {account['username']}.")
+    except Exception as e:
+        logging.error(f"Background re-hash failed for {account['username']}: {e}")
+
+def rehash_if_needed(account, password):
+    """
+    After a successful login, upgrade a hash whose cost differs from the hashing policy.
+    The new hash is computed and persisted in the hash pool, off the login path.
+    """
+    if get_policy().needs_rehash(account["password"]):
+        _hash_executor.submit(_rehash, account, password, account["password"])
+
+def _pre_check(username, source):
+    """
+    Everything authenticate() does before bcrypt.
+    Returns (status, account) if the attempt is already decided, else (None, account).
+    """
+    lockouts.expire_due()
+    key = username.strip().lower()
+    if not user_limiter.allow(key) or (source is not None and not source_limiter.allow(source)):
+        log_warning(f"Login attempt throttled for user: {username} (source: {source}).")
+        return AUTH_THROTTLED, None
+    account = find_login_account(username)
+    if account is None:
+        # Unknown usernames are tracked in memory only, so guessing them gets throttled too
+        if lockouts.is_locked(username) or lockouts.record_failure(username):
+            return AUTH_THROTTLED, None
+        return AUTH_NOT_FOUND, None
+    if is_locked_out(account):
+        return AUTH_LOCKED, account
+    return None, account
+
+def _post_check(username, password, account, password_ok):
+    if password_ok:
+        lockouts.record_success(username)
+        rehash_if_needed(account, password)
+        return AUTH_OK, account
+    # Only the failure that crosses the threshold writes to storage (the lock itself)
+    if lockouts.record_failure(username, account):
+        return AUTH_LOCKED, account
+    return AUTH_BAD_PASSWORD, account
+
+def _audit_login(username, status, source):
+    count(f"auth_{status}")
+    outcome = audit_log.SUCCESS if status == AUTH_OK else audit_log.FAILURE
+    audit_log.record_event(audit_log.LOGIN, username.strip(), outcome, status=status, source=source)
+    return status
+
+@timed("auth_authenticate")
+def authenticate(username, password, source=None):
+    """
+    Check a username/password pair without prompting.
+    Returns (status, account) where status is one of AUTH_OK, AUTH_NOT_FOUND,
+    AUTH_LOCKED, AUTH_BAD_PASSWORD or AUTH_THROTTLED; account is None for
+    AUTH_NOT_FOUND and AUTH_THROTTLED. `source` (e.g. a client IP) is rate limited too.
+    """
+    status, account = _pre_check(username, source)
+    if not status:
+        status, account = _post_check(username, password, account, check_password(password, account["password"]))
+    return _audit_login(username, status, source), account
+
+async def authenticate_async(username, password, source=None):
+    """
+    authenticate() for asyncio servers: the bcrypt check runs in the bounded hash pool, and the
+    store lookups and lock writes around it in the loop's default executor, off the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    status, account = await loop.run_in_executor(None, _pre_check, username, source)
+    if not status:
+        password_ok = await loop.run_in_executor(_hash_executor, check_password, password, account["password"])
+        status, account = await loop.run_in_executor(None, _post_check, username, password, account, password_ok)
+    return _audit_login(username, status, source), account
+
+async def hash_password_async(password):
+    """hash_password() in the bounded hash pool, so it doesn't block the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, hash_password, password)
+
 # ------------------ Main Login Function ------------------
 def login():
     """
-    Main login flow:
+    Main login flow (an interactive shell over authenticate()):
     1. Loads accounts from FILE_PATH
     2. Prompts user for username & password
     3. Auto-unlocks account if locked > 30 minutes
@@ -34,8 +166,8 @@ def login():
 
     while login_counter > 0:
         username_input = input("Enter your username: ").strip()
-        
-        account = next((acc for acc in accounts if acc["username"].strip() == username_input), None)
+
+        account = find_login_account(username_input)
 
         if not account:
             print("❌ Username not found. Please try again.")
@@ -43,19 +175,26 @@ def login():
             continue
 
         # For non-admins, check if account is locked and try auto-unlock
-        if account.get("role", "user").lower() != "admin" and account.get("is_locked", False):
-            if auto_unlock_account(account):
-                update_accounts_file(accounts)
-                print("🔓 Your account has been auto-unlocked. Please continue.")
-            else:
-                log_warning(f"User {username_input} is locked out.")
-                print("🔒 Your account is locked. Please contact the admin.")
-                return None
+        was_locked = account.get("is_locked", False)
+        if is_locked_out(account):
+            log_warning(f"User {username_input} is locked out.")
+            print("🔒 Your account is locked. Please contact the admin.")
+            return None
+        if was_locked and not account.get("is_locked"):
+            print("🔓 Your account has been auto-unlocked. Please continue.")
 
         # Prompt for password
         password_input = getpass("Enter your password: ").strip()
-        
-        if bcrypt.checkpw(password_input.encode(), account["password"].encode()):
+        status, account = authenticate(username_input, password_input)
+
+        if status == AUTH_THROTTLED:
+            print("⏳ Too many login attempts. Please wait a minute and try again.")
+            return None
+        if status == AUTH_LOCKED:
+            log_error(f"User {username_input} exceeded max login attempts.")
+            print("⚠️ Too many attempts. Your account is now locked.")
+            return None
+        if status == AUTH_OK:
             matched_account = account
             log_info(f"Login successful for user: {username_input}.")
             print(f"✅ Login successful! Welcome back, {matched_account.get('first name', 'User').capitalize()}")
@@ -73,12 +212,11 @@ def login():
                     else:
                         return None
 
-    if login_counter == 0:
+    if login_counter == 0 and account:
         log_error(f"User {username_input} exceeded max login attempts.")
         print("⚠️ Too many attempts. Your account is now locked.")
-        account["is_locked"] = True
-        account["lock_time"] = datetime.now().isoformat()
-        update_accounts_file(accounts, log_message=f"User {username_input} locked out.")
+        # Only the lock fields are persisted (a single journal append in journal mode)
+        lockouts.lock(account["username"], account)
         return None
 
     return matched_account
@@ -88,4 +226,4 @@ if __name__ == "__main__":
     if user:
         print("User logged in:", user["username"])
     else:
-        print("Login failed.")
\ No newline at end of file
+        print("Login failed.")
@@ -0,0 +1,205 @@
+# Benchmark harness for the storage, auth and to-do hot paths.
+# Generates synthetic accounts and to-do files at each scale in a temporary directory,
+# times the non-interactive code paths behind the menus and writes the results as JSON,
+# so runs from different commits can be compared.
+import os, io, sys, json, time, random, shutil, logging, argparse, platform, tempfile, subprocess, contextlib
+from datetime import datetime
+import bcrypt
+import account_storage, to_do_list, sqlite_storage, audit_log, metrics, atomic_io, codec
+from account_storage import load_accounts, save_accounts, get_store
+from account_validator import AccountValidator
+from user_account import UserAccount
+from password_policy import HashingPolicy, set_policy
+from helper import remove_account_by_username, update_account
+from to_do_list import UserToDoList
+import auth
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+PASSWORD = "Bench#Pass1"
+
+# ------------------ Synthetic Data ------------------
+def make_account(i, password_hash):
+    now = datetime.now().isoformat()
+    return {
+        "first name": "Bench",
+        "last name": "User",
+        "username": f"bench{i:07d}",
+        "phone number": f"514{i:07d}",
+        "password": password_hash,
+        "email": f"bench{i:07d}@example.com",
+        "role": "user",
+        "is_locked": False,
+        "date_created": now,
+        "date_modified": now
+    }
+
+def generate_files(directory, size, rounds, tasks_per_user=5, users_with_tasks=0.1):
+    """Write synthetic accounts and to-do files; every account shares one low-cost hash of PASSWORD."""
+    password_hash = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds)).decode()
+    accounts_path = os.path.join(directory, "user_accounts.json")
+    tasks_path = os.path.join(directory, "to_do_list.json")
+    atomic_io.atomic_write_encoded(accounts_path, {
+        "schema_version": account_storage.SCHEMA_VERSION,
+        "version": 1,
+        "journal_seq": 0,
+        "accounts": [make_account(i, password_hash) for i in range(size)]
+    })
+    task_users = max(1, int(size * users_with_tasks))
+    atomic_io.atomic_write_encoded(tasks_path, {
+        f"bench{i:07d}": [f"task {n}" for n in range(tasks_per_user)] for i in range(task_users)
+    })
+    return accounts_path, tasks_path
+
+def point_modules_at(directory, accounts_path, tasks_path):
+    """Repoint the storage modules at the generated files (their get_* functions pick the change up)."""
+    account_storage.FILE_PATH = accounts_path
+    account_storage._store = None
+    sqlite_storage.DB_PATH = os.path.join(directory, "user_management.db")
+    # Close the previous size's database connection so nothing carries over between sizes
+    with sqlite_storage._shared_lock:
+        for connection, _ in sqlite_storage._shared.values():
+            connection.close()
+        sqlite_storage._shared.clear()
+    if account_storage.STORAGE_BACKEND == "sqlite" or to_do_list.TASKS_BACKEND == "sqlite":
+        sqlite_storage.import_json_files(accounts_path, tasks_path, sqlite_storage.DB_PATH)
+    to_do_list.TASKS_FILE_PATH = tasks_path
+    to_do_list.TASKS_SHARD_DIR = os.path.join(directory, "to_do_list_shards")
+    to_do_list.TASKS_OPLOG_DIR = os.path.join(directory, "to_do_list_oplog")
+    to_do_list._task_store = None
+    to_do_list._task_oplog = None
+    audit_log.AUDIT_FILE_PATH = os.path.join(directory, "audit.jsonl")
+
+# ------------------ Timing ------------------
+def measure(function, iterations):
+    """Call function(i) `iterations` times; returns latency stats in milliseconds."""
+    samples = []
+    # Expected warnings (e.g. "Duplicate username found" from is_unique) would flood stderr
+    root_logger = logging.getLogger()
+    level = root_logger.level
+    root_logger.setLevel(logging.ERROR)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(iterations):
+                start = time.perf_counter()
+                function(i)
+                samples.append((time.perf_counter() - start) * 1000)
+    finally:
+        root_logger.setLevel(level)
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": sum(samples) / len(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "max_ms": samples[-1]
+    }
+
+def run_size(size, args):
+    directory = tempfile.mkdtemp(prefix=f"bench_{size}_")
+    try:
+        start = time.perf_counter()
+        accounts_path, tasks_path = generate_files(directory, size, args.rounds)
+        point_modules_at(directory, accounts_path, tasks_path)
+        result = {
+            "generate_s": time.perf_counter() - start,
+            "accounts_file_bytes": os.path.getsize(accounts_path),
+            "tasks_file_bytes": os.path.getsize(tasks_path)
+        }
+        metrics.registry.reset()
+        rng = random.Random(args.seed)
+        reads, writes = args.iterations, args.write_iterations
+        validator = AccountValidator(UserAccount())
+
+        def cold_load(i):
+            account_storage._store = None
+            load_accounts()
+
+        result["load_accounts_cold"] = measure(cold_load, min(reads, 5))
+        result["load_accounts_warm"] = measure(lambda i: load_accounts(), reads)
+        result["is_unique_taken"] = measure(
+            lambda i: validator.is_unique("username", f"bench{rng.randrange(size):07d}"), reads)
+        result["is_unique_free"] = measure(
+            lambda i: validator.is_unique("email", f"new{i}@example.com"), reads)
+        # A different user each time so the per-user login rate limit never kicks in
+        result["auth_lookup_verify"] = measure(
+            lambda i: auth.authenticate(f"bench{i % size:07d}", PASSWORD), reads)
+        result["save_accounts"] = measure(
+            lambda i: save_accounts(make_account(size + i, PASSWORD)), writes)
+        # The persistence step of edit_profile (the prompts are skipped)
+        result["edit_profile_update"] = measure(
+            lambda i: update_account(get_store().find("username", f"bench{i:07d}"),
+                                     {"first name": "Edited", "date modified": datetime.now().isoformat()}), writes)
+        result["remove_account_by_username"] = measure(
+            lambda i: remove_account_by_username([], f"bench{size - 1 - i:07d}"), writes)
+        result["save_tasks_for_user"] = measure(
+            lambda i: UserToDoList.save_tasks_for_user(f"bench{i:07d}", [f"task {n}" for n in range(5)]), writes)
+
+        def record_task_change(i):
+            tasks = UserToDoList.load_task_list(f"bench{i:07d}")
+            tasks.add(f"benchmark task {i}")
+            UserToDoList.record_changes(f"bench{i:07d}", tasks)
+
+        result["todo_record_changes"] = measure(record_task_change, writes)
+        atomic_io.flush_all()
+        audit_log.flush_events()
+        result["metrics"] = metrics.snapshot()
+        return result
+    finally:
+        account_storage._store = None
+        to_do_list._task_store = None
+        to_do_list._task_oplog = None
+        shutil.rmtree(directory, ignore_errors=True)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the storage, auth and to-do hot paths.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated account counts (e.g. 1000,10000,100000,1000000)")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--iterations", type=int, default=200, help="samples per read benchmark")
+    parser.add_argument("--write-iterations", type=int, default=20, help="samples per write benchmark")
+    parser.add_argument("--rounds", type=int, default=4, help="bcrypt cost used for the synthetic accounts")
+    parser.add_argument("--format", default=codec.STORAGE_FORMAT, choices=codec.available_formats(),
+                        help="snapshot file format of the synthetic and rewritten files")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    codec.STORAGE_FORMAT = args.format
+
+    # Low bcrypt cost, matching the synthetic hashes so logins don't trigger a re-hash
+    set_policy(HashingPolicy(args.rounds))
+    metrics.enable()
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "storage_backend": account_storage.STORAGE_BACKEND,
+            "storage_mode": account_storage.STORAGE_MODE,
+            "storage_format": args.format,
+            "bcrypt_rounds": args.rounds,
+            "seed": args.seed
+        },
+        "sizes": {}
+    }
+    for size in (int(value) for value in args.sizes.split(",")):
+        print(f"⏱️ Benchmarking {size:,} accounts...")
+        results["sizes"][str(size)] = run_size(size, args)
+        for name, stats in results["sizes"][str(size)].items():
+            if isinstance(stats, dict) and "mean_ms" in stats:
+                print(f"   {name:<28} mean {stats['mean_ms']:9.3f} ms   p95 {stats['p95_ms']:9.3f} ms")
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"✅ Results written to {args.output}")
+    return results
+
+if __name__ == "__main__":
+    # Usage: python benchmark.py [--sizes 1000,10000,100000] [--output benchmark_results.json]
+    # Add 1000000 to --sizes for the 1M run; generating it takes a while.
+    main()
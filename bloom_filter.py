@@ -0,0 +1,62 @@
+import json, math, hashlib
+from atomic_io import atomic_write_bytes
+
+# ------------------ BloomFilter Class ------------------
+class BloomFilter:
+    """
+    Fixed-size Bloom filter: `in` answers "definitely not present" or "maybe present".
+    Sized for `capacity` items at `error_rate` false positives; items can't be removed,
+    so the owner rebuilds it from the data (e.g. on compaction).
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: k positions from the two halves of one 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def is_full(self):
+        return self.count >= self.capacity
+
+    def save(self, path, signature=None):
+        """Write the filter (and the data signature it was built from) atomically."""
+        header = {
+            "capacity": self.capacity, "error_rate": self.error_rate,
+            "count": self.count, "signature": signature
+        }
+        atomic_write_bytes(path, json.dumps(header).encode() + b"\n" + bytes(self._bits))
+
+    @classmethod
+    def load(cls, path):
+        """Return (filter, signature) from a file written by save(), or (None, None)."""
+        try:
+            with open(path, "rb") as file:
+                header = json.loads(file.readline())
+                bloom = cls(header["capacity"], header["error_rate"])
+                bits = file.read()
+        except (OSError, ValueError, KeyError):
+            return None, None
+        if len(bits) != len(bloom._bits):
+            return None, None
+        bloom._bits = bytearray(bits)
+        bloom.count = header["count"]
+        return bloom, header["signature"]
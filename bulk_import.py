@@ -0,0 +1,143 @@
+import os, sys, csv, json, logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from account_storage import get_store, DuplicateAccountError
+from password_policy import get_policy
+from profile_validation import UNIQUE_FIELDS, normalize_profile, validate_many
+import audit_log
+
+# Columns of a CSV import/export, in order; JSON-lines records use the same keys
+CSV_FIELDS = ["first name", "last name", "username", "phone number", "password", "email", "role"]
+
+# ------------------ Reading Records ------------------
+def read_records(path):
+    """
+    Stream (line number, record) pairs from a JSON-lines or CSV file (chosen by the .csv extension).
+    Lines that cannot be parsed are yielded with a None record.
+    """
+    with open(path, "r", newline="", encoding="utf-8") as file:
+        if path.lower().endswith(".csv"):
+            for line_number, record in enumerate(csv.DictReader(file), start=2):
+                yield line_number, record
+            return
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            yield line_number, record if isinstance(record, dict) else None
+
+# ------------------ Bulk Import ------------------
+def _taken_messages(fields):
+    return [f"⚠️ This {field} is already taken." for field in fields]
+
+def _taken_errors(store, profile):
+    return _taken_messages([field for field in UNIQUE_FIELDS if store.exists(field, profile[field])])
+
+def bulk_import(path, workers=None):
+    """
+    Create the accounts listed in a JSON-lines or CSV file.
+    Every record is checked with the account creation rules and against both the
+    existing accounts and the earlier records of the file, plain passwords are hashed
+    in a worker pool, and the accepted accounts are stored in a single write.
+    Returns (number imported, [(line number, username, errors)] for the rejected records).
+    """
+    store = get_store()
+    line_numbers, profiles, rejected = [], [], []
+    for line_number, record in read_records(path):
+        if record is None:
+            rejected.append((line_number, None, ["❌ Unreadable record."]))
+            continue
+        line_numbers.append(line_number)
+        profiles.append(normalize_profile(record))
+
+    # Validation and hashing happen before the store lock is taken, so other logins and
+    # writes (in this and other processes) are only blocked for the final check and write
+    candidates = []
+    for line_number, profile, errors in zip(line_numbers, profiles, validate_many(profiles, normalize=False)):
+        errors += _taken_errors(store, profile)
+        if errors:
+            rejected.append((line_number, profile["username"], errors))
+            continue
+        now = datetime.now().isoformat()
+        profile.setdefault("is_locked", False)
+        profile.setdefault("date_created", now)
+        profile.setdefault("date_modified", now)
+        candidates.append((line_number, profile))
+
+    # bcrypt releases the GIL while hashing, so threads run the hashes in parallel
+    plain = [account for _, account in candidates if not account["password"].startswith("$2b$")]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for account, hashed_password in zip(plain, pool.map(get_policy().hash, (a["password"] for a in plain))):
+            account["password"] = hashed_password
+
+    with store.locked():
+        # Checked again: another process may have taken a value while the passwords were hashed
+        checked = []
+        for line_number, profile in candidates:
+            errors = _taken_errors(store, profile)
+            if errors:
+                rejected.append((line_number, profile["username"], errors))
+            else:
+                checked.append((line_number, profile))
+        accepted = [profile for _, profile in checked]
+        if accepted:
+            try:
+                store.add_many(accepted)
+            except DuplicateAccountError:
+                # The batch was rolled back: another process took a value after the check,
+                # so add the accounts one by one and reject those that lost the race
+                accepted = []
+                for line_number, profile in checked:
+                    try:
+                        store.add(profile)
+                        accepted.append(profile)
+                    except DuplicateAccountError as e:
+                        rejected.append((line_number, profile["username"], _taken_messages(e.fields)))
+    for account in accepted:
+        audit_log.record_event(audit_log.ACCOUNT_CREATED, account["username"], source="import")
+    logging.info(f"Bulk import from {path}: {len(accepted)} account(s) imported, {len(rejected)} rejected.")
+    return len(accepted), rejected
+
+# ------------------ Export ------------------
+def export_accounts(fields=None):
+    """Yield every account as one JSON line, optionally limited to `fields`, without building the whole file."""
+    for account in get_store().iter_accounts():
+        if fields:
+            account = {field: account.get(field) for field in fields}
+        yield json.dumps(account) + "\n"
+
+def export_to_file(path):
+    """Write every account to a JSON-lines or CSV file (chosen by the .csv extension). Returns the count."""
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        if path.lower().endswith(".csv"):
+            writer = csv.DictWriter(file, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            for account in get_store().iter_accounts():
+                writer.writerow(account)
+                count += 1
+        else:
+            for line in export_accounts():
+                file.write(line)
+                count += 1
+    logging.info(f"Exported {count} account(s) to {path}.")
+    return count
+
+if __name__ == "__main__":
+    # Usage: python bulk_import.py import|export <file.jsonl|file.csv>
+    if len(sys.argv) != 3 or sys.argv[1] not in ("import", "export"):
+        print("Usage: python bulk_import.py import|export <file.jsonl|file.csv>")
+        sys.exit(1)
+    if sys.argv[1] == "export":
+        print(f"✅ Exported {export_to_file(sys.argv[2])} account(s) to {sys.argv[2]}")
+        sys.exit(0)
+    if not os.path.exists(sys.argv[2]):
+        print(f"❌ File not found: {sys.argv[2]}")
+        sys.exit(1)
+    imported, rejected = bulk_import(sys.argv[2])
+    for line_number, username, errors in rejected:
+        print(f"⚠️ Line {line_number} ({username or 'unknown'}): {' '.join(errors)}")
+    print(f"✅ Imported {imported} account(s), {len(rejected)} rejected.")
@@ -0,0 +1,99 @@
+import os, json, marshal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Format of the accounts and to-do snapshot files:
+# "json" compact JSON, "orjson" compact JSON written by orjson (stdlib json if it isn't installed),
+# "msgpack" binary MessagePack (needs msgpack), "marshal" binary stdlib marshal (trusted local files only).
+# Files are auto-detected on load, so switching formats only takes effect on the next write.
+STORAGE_FORMAT = os.environ.get("STORAGE_FORMAT", "json")
+
+JSON, ORJSON, MSGPACK, MARSHAL = "json", "orjson", "msgpack", "marshal"
+
+# Binary snapshots start with this header plus one format byte; JSON text never starts with NUL
+MAGIC = b"\x00UMS"
+_FORMAT_BYTES = {MSGPACK: b"M", MARSHAL: b"S"}
+
+def available_formats():
+    return [JSON, MARSHAL] + ([ORJSON] if orjson else []) + ([MSGPACK] if msgpack else [])
+
+# ------------------ Encoding ------------------
+def encode(payload, fmt=None):
+    """Serialize `payload` to bytes in `fmt` (default STORAGE_FORMAT)."""
+    fmt = fmt or STORAGE_FORMAT
+    if fmt == ORJSON and orjson:
+        return orjson.dumps(payload)
+    if fmt == MSGPACK:
+        if msgpack is None:
+            raise ValueError("The msgpack format needs the msgpack package (pip install msgpack).")
+        return MAGIC + _FORMAT_BYTES[MSGPACK] + msgpack.packb(payload, use_bin_type=True)
+    if fmt == MARSHAL:
+        return MAGIC + _FORMAT_BYTES[MARSHAL] + marshal.dumps(payload)
+    if fmt not in (JSON, ORJSON):
+        raise ValueError(f"Unknown storage format: {fmt}")
+    # ensure_ascii=False keeps the output UTF-8 like orjson's
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()
+
+def encode_pretty(payload):
+    """Indented, human-readable JSON; only used for explicit exports."""
+    return json.dumps(payload, indent=4, ensure_ascii=False).encode()
+
+# ------------------ Decoding ------------------
+class UnreadableFileError(Exception):
+    """
+    A snapshot file exists but can't be decoded here (corrupt, an unknown format, or a format
+    whose package isn't installed). Stores raise it instead of starting empty, so the next
+    write never overwrites data that simply couldn't be read; the file has to be fixed or moved away.
+    """
+
+    def __init__(self, path, reason):
+        super().__init__(f"{path} could not be read ({reason}). Refusing to overwrite it: "
+                         f"restore it, install the missing package, or move it away to start empty.")
+        self.path = path
+
+def detect_format(data):
+    if data.startswith(MAGIC):
+        for fmt, marker in _FORMAT_BYTES.items():
+            if data[len(MAGIC):len(MAGIC) + 1] == marker:
+                return fmt
+        raise ValueError("Unknown binary snapshot format.")
+    return JSON
+
+def decode(data):
+    """Deserialize bytes written by encode() in any format (or plain JSON). Raises ValueError if corrupt."""
+    fmt = detect_format(data)
+    body = data[len(MAGIC) + 1:]
+    try:
+        if fmt == MSGPACK:
+            if msgpack is None:
+                raise ValueError("This file is in msgpack format; install msgpack to read it.")
+            return msgpack.unpackb(body, raw=False)
+        if fmt == MARSHAL:
+            return marshal.loads(body)
+        # orjson parses any JSON, including the indented files written before this codec
+        return orjson.loads(data) if orjson else json.loads(data)
+    except (EOFError, TypeError) as e:
+        raise ValueError(f"Corrupt {fmt} snapshot: {e}") from e
+
+def load_file(path):
+    """Read and decode a file written in any supported format."""
+    with open(path, "rb") as file:
+        return decode(file.read())
+
+def load_existing(path):
+    """
+    Like load_file(), but only a missing file raises FileNotFoundError;
+    an unreadable one raises UnreadableFileError.
+    """
+    try:
+        return load_file(path)
+    except ValueError as e:
+        raise UnreadableFileError(path, e) from e
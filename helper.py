@@ -1,15 +1,20 @@
-import json, logging, bcrypt
+import logging
 from datetime import datetime, timedelta
 from getpass import getpass
-from account_storage import FILE_PATH
+from account_storage import get_store
+from password_policy import get_policy
+import audit_log
+from session_manager import get_session_manager
+from metrics import timed
 
 # ------------------ Logging ------------------
+# These go through the root logger, which activity_log.setup_activity_logging() routes through a background queue
 def log_warning(message):
     logging.warning(message)
 def log_info(message):
     logging.info(message)
 def log_error(message):
-    logging.info(message)
+    logging.error(message)
 # ------------------ Menu Choice ------------------
 def menu_choice(prompt, low_bin, high_bin):
     """
@@ -23,6 +28,12 @@ def menu_choice(prompt, low_bin, high_bin):
             print(f"❌ Invalid option. Please enter a number between {low_bin} and {high_bin}.")
         else:
             return int(choice)
+# ------------------ Account Summary ------------------
+def print_account_summary(account):
+    """Print one account on a single line (used by the admin search and listing)."""
+    name = f"{account.get('first name', '')} {account.get('last name', '')}".strip()
+    locked = " | 🔒 locked" if account.get("is_locked") else ""
+    print(f"- {account['username']} | {name} | {account.get('email', '')} | {account.get('role', 'user')}{locked}")
 # ------------------ Edit Profile ------------------
 def edit_profile(account, accounts, file_path):
     """
@@ -38,6 +49,7 @@ def edit_profile(account, accounts, file_path):
         "4": ("email", "Enter new email: ", lambda x: x.strip().lower()),
         "5": ("password", "Enter new password: ", None)  # We'll hash the password
     }
+    changes = {}
     while True:
         print("\n1. First Name")
         print("2. Last Name")
@@ -50,14 +62,13 @@ def edit_profile(account, accounts, file_path):
             field, prompt_msg, transform = field_prompts[option]
             new_value = input(prompt_msg)
             if field == "password":
-                hashed = bcrypt.hashpw(new_value.encode(), bcrypt.gensalt())
-                account["password"] = hashed.decode()
+                changes["password"] = get_policy().hash(new_value)
                 log_info(f"Password updated for user: {account['username']}.")
                 print("✅ Password updated successfully!")
             else:
                 if transform:
                     new_value = transform(new_value)
-                account[field] = new_value
+                changes[field] = new_value
                 print(f"✅ {field.title()} updated successfully!")
         elif option == "6":
             print("🚀 Canceling edit...")
@@ -69,17 +80,22 @@ def edit_profile(account, accounts, file_path):
             break
     log_info(f"Profile updated for user: {account['username']}.")
     # update the time modified
-    account["date modified"] = datetime.now().isoformat()
-    with open(file_path, "w") as file:
-        json.dump(accounts, file, indent=4)
+    changes["date modified"] = datetime.now().isoformat()
+    # Only the edited fields are persisted
+    get_store().update(account, changes)
+    audit_log.record_event(audit_log.PROFILE_UPDATED, account["username"], fields=sorted(changes))
     log_info(f"Profile saved for user: {account['username']}.")
     print("✅ Profile updated successfully!")
 # ------------------ Remove Profile (user panel) ------------------
 def remove_account(accounts, account):
-    """Removes the given account from the list and updates the file."""
-    if account in accounts:
-        accounts.remove(account)
-        update_accounts_file(accounts)
+    """Removes the given account from the store (and from `accounts`, if it is there) and ends its sessions."""
+    store = get_store()
+    if store.find("username", account["username"]) is not None:
+        if account in accounts:
+            accounts.remove(account)
+        store.remove(account)
+        get_session_manager().revoke_user(account["username"])
+        audit_log.record_event(audit_log.ACCOUNT_REMOVED, account["username"])
         log_info(f"Account deleted for user: {account['username']}.")
         print("✅ Account deleted successfully!")
     else:
@@ -88,20 +104,30 @@ def remove_account(accounts, account):
 # ------------------ Remove Profiles (admin panel) ------------------
 def remove_account_by_username(accounts, username):
     """Removes the account matching the given username and updates the file."""
-    for acc in accounts:
-        if acc["username"].strip().lower() == username.lower():
+    store = get_store()
+    # Lookup and delete happen under the store's file lock so no other process changes the account in between
+    with store.locked():
+        acc = store.find("username", username)
+        if acc is not None:
+            store.remove(acc)
+    if acc is not None:
+        if acc in accounts:
             accounts.remove(acc)
-            update_accounts_file(accounts)
-            log_info(f"Account deleted for user: {acc['username']}.")
-            print("✅ Account deleted successfully!")
-            return
+        get_session_manager().revoke_user(acc["username"])
+        audit_log.record_event(audit_log.ACCOUNT_REMOVED, acc["username"], by="admin")
+        log_info(f"Account deleted for user: {acc['username']}.")
+        print("✅ Account deleted successfully!")
+        return
     log_warning(f"No account found with username: {username}.")
     print("❌ No account found with that username.")
-# ------------------ Update the accounts file ------------------
-def update_accounts_file(accounts,log_message="Accounts file updated successfully."):
-    """Writes the accounts list to the file."""
-    with open(FILE_PATH, "w") as file:
-        json.dump(accounts, file, indent=4)
+# ------------------ Update a single account ------------------
+@timed("accounts_update")
+def update_account(account, changes, unset=(), log_message="Account updated successfully."):
+    """
+    Applies `changes` (and removes the `unset` fields) on one account
+    and persists only that delta instead of rewriting every account.
+    """
+    get_store().update(account, changes, unset)
     log_info(log_message)
 # ------------------ Reset password ------------------
 def reset_password(account, accounts):
@@ -115,34 +141,27 @@ def reset_password(account, accounts):
     
     if not new_password:
         print("❌ New password cannot be empty.")
+        audit_log.record_event(audit_log.PASSWORD_RESET, account["username"], audit_log.FAILURE, reason="empty")
         return False
     
     if new_password != confirm_password:
         print("❌ Passwords do not match. Please try again.")
+        audit_log.record_event(audit_log.PASSWORD_RESET, account["username"], audit_log.FAILURE, reason="mismatch")
         return False
 
-    hashed_password = bcrypt.hashpw(new_password.encode(),bcrypt.gensalt())
-    account['password'] = hashed_password.decode()
-    account['date_modified'] = datetime.now().isoformat()
-    update_accounts_file(accounts, log_message=f"Password reset for {account['username']}.")
+    changes = {'password': get_policy().hash(new_password), 'date_modified': datetime.now().isoformat()}
+    update_account(account, changes, log_message=f"Password reset for {account['username']}.")
+    audit_log.record_event(audit_log.PASSWORD_RESET, account["username"])
     print("✅ Password reset successfully!")
     return True
-# ------------------ Auto-unlock accounts ------------------
-def auto_unlock_account(account):
+# ------------------ Lock expiry ------------------
+def lock_expiry_time(account, lockout_seconds):
     """
-    If the account is locked and has been locked for at least 30 minutes,
-    unlocks the account (sets 'is_locked' to False and removes 'lock_time').
-    
-    Returns:
-        True if the account was unlocked (i.e., 30 minutes have passed), else False.
+    When the account's lock ends (a datetime): lock_time + `lockout_seconds`
+    (rate_limiter.LOCKOUT_SECONDS), or None if it is not locked with a lock_time.
     """
-        # Check if the account is marked as locked and has a lock time recorded
+    # Check if the account is marked as locked and has a lock time recorded
     if account.get("is_locked") and account.get("lock_time"):
         # Convert the stored lock_time (ISO string) back to a datetime object
-        lock_time = datetime.fromisoformat(account["lock_time"])
-        # Check if 30 minutes have passed since lock_time
-        if datetime.now() - lock_time >= timedelta(minutes=30):
-            account["is_locked"] = False   # Unlock the account
-            account.pop("lock_time", None) # Remove the lock_time key
-            return True
-    return False
+        return datetime.fromisoformat(account["lock_time"]) + timedelta(seconds=lockout_seconds)
+    return None
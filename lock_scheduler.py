@@ -0,0 +1,205 @@
+import os, time, heapq, logging, threading
+from account_storage import get_store, DuplicateAccountError
+from helper import lock_expiry_time, log_info
+from rate_limiter import LOCKOUT_SECONDS
+import audit_log
+
+# The expiry thread wakes at the next unlock time, and at least this often to pick up
+# locks written by other processes
+LOCK_SCHEDULER_TICK_SECONDS = float(os.environ.get("LOCK_SCHEDULER_TICK_SECONDS", "30"))
+
+def _normalize(username):
+    return str(username).strip().lower()
+
+# ------------------ LockExpiryScheduler Class ------------------
+class LockExpiryScheduler:
+    """
+    Unlocks accounts once their lockout window (lock_time + LOCKOUT_SECONDS) has passed.
+    Every locked account is kept in a username -> (unlock time, username) map, the O(1)
+    "currently locked" set behind the admin panel, and in a min-heap ordered by unlock time.
+    A daemon thread sleeps until the earliest unlock, pops everything due and unlocks it
+    with one batched store write per tick, so logins never pay for the expiry check.
+    Like the search index it listens to the store, so locks and unlocks made anywhere
+    (failed logins, the admin panel, the API, other processes) keep it up to date.
+    """
+
+    def __init__(self, store, window_seconds=None, tick_seconds=None):
+        self.store = store
+        self.window_seconds = LOCKOUT_SECONDS if window_seconds is None else window_seconds
+        self.tick_seconds = tick_seconds or LOCK_SCHEDULER_TICK_SECONDS
+        self._condition = threading.Condition(threading.RLock())
+        self._source = None
+        self._dirty = True
+        self._locked = {}   # lowercase username -> (unlock time or None, username)
+        self._heap = []     # (unlock time, lowercase username); may hold stale entries
+        self._thread = None
+        self._stopping = False
+        store.add_listener(self)
+
+    def _unlock_time(self, account):
+        expires = lock_expiry_time(account, self.window_seconds)
+        return expires.timestamp() if expires is not None else None
+
+    # ------------------ Store Listener ------------------
+    def rebuild(self, source):
+        with self._condition:
+            self._source, self._dirty = source, True
+            self._condition.notify()
+
+    def add(self, account):
+        if not account.get("is_locked"):
+            return
+        with self._condition:
+            if not self._dirty:
+                self._schedule(account)
+                self._condition.notify()
+
+    def discard(self, account):
+        with self._condition:
+            if not self._dirty:
+                self._locked.pop(_normalize(account["username"]), None)
+
+    # ------------------ Building ------------------
+    def _schedule(self, account):
+        # Locks without a lock_time (set by hand) are listed but never expire
+        unlock_at = self._unlock_time(account)
+        key = _normalize(account["username"])
+        self._locked[key] = (unlock_at, account["username"])
+        if unlock_at is not None:
+            heapq.heappush(self._heap, (unlock_at, key))
+
+    def _build(self):
+        self._locked, self._heap = {}, []
+        for account in self._source():
+            if account.get("is_locked"):
+                self._schedule(account)
+        self._dirty = False
+        logging.info(f"Lock scheduler tracking {len(self._locked)} locked account(s).")
+
+    def _ensure_built(self):
+        self.store.refresh()
+        with self._condition:
+            if self._dirty:
+                self._build()
+
+    # ------------------ Queries ------------------
+    def is_locked(self, username):
+        """O(1): True if the account is currently locked."""
+        self._ensure_built()
+        return _normalize(username) in self._locked
+
+    def locked_usernames(self):
+        """The usernames of every locked account, soonest unlock first (locks without a lock_time last)."""
+        self._ensure_built()
+        with self._condition:
+            entries = list(self._locked.values())
+        return [username for unlock_at, username in sorted(entries, key=lambda e: (e[0] is None, e[0] or 0, e[1]))]
+
+    def __len__(self):
+        self._ensure_built()
+        return len(self._locked)
+
+    # ------------------ Expiry ------------------
+    def _unlock(self, accounts, now):
+        """Unlock the accounts whose lock is still stored and due, in one write. Returns those unlocked."""
+        store = self.store
+        with store.locked():
+            due = []
+            for account in accounts:
+                stored = store.find("username", account["username"])
+                unlock_at = self._unlock_time(stored) if stored is not None else None
+                if unlock_at is not None and unlock_at <= now:
+                    due.append(account)
+            if due:
+                try:
+                    store.update_many([(account, {"is_locked": False}, ("lock_time",)) for account in due])
+                except DuplicateAccountError as e:
+                    # The batch was rolled back by a unique value another process changed;
+                    # unlock one by one so only the conflicting accounts wait for the next tick
+                    logging.warning(f"Batched unlock rejected ({e}), unlocking one account at a time.")
+                    due = [account for account in due if self._unlock_one(account)]
+        for account in due:
+            audit_log.record_event(audit_log.ACCOUNT_UNLOCKED, account["username"], by="expiry")
+            log_info(f"User {account['username']} auto-unlocked.")
+        return due
+
+    def _unlock_one(self, account):
+        try:
+            self.store.update(account, {"is_locked": False}, unset=("lock_time",))
+            return True
+        except DuplicateAccountError as e:
+            logging.warning(f"Could not unlock {account['username']}: {e}")
+            return False
+
+    def run_due(self, now=None):
+        """Unlock every account whose lockout is over. Returns the unlocked usernames."""
+        now = time.time() if now is None else now
+        self._ensure_built()
+        with self._condition:
+            keys = []
+            while self._heap and self._heap[0][0] <= now:
+                unlock_at, key = heapq.heappop(self._heap)
+                # Skip stale heap entries left by an unlock or a newer lock of the same account
+                if self._locked.get(key, (None,))[0] == unlock_at:
+                    keys.append(key)
+        if not keys:
+            return []
+        accounts = [account for account in (self.store.find("username", key) for key in keys) if account]
+        return [account["username"] for account in self._unlock(accounts, now)]
+
+    def unlock_if_expired(self, account, now=None):
+        """Unlock one account right away if its lockout is over (the thread may not have got to it yet)."""
+        now = time.time() if now is None else now
+        unlock_at = self._unlock_time(account)
+        if unlock_at is None or unlock_at > now:
+            return False
+        return bool(self._unlock([account], now))
+
+    # ------------------ Background Thread ------------------
+    def start(self):
+        with self._condition:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="lock-expiry", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._stopping:
+                    return
+                timeout = self.tick_seconds
+                if self._dirty:
+                    timeout = 0
+                elif self._heap:
+                    timeout = min(timeout, max(0.0, self._heap[0][0] - time.time()))
+                if timeout > 0:
+                    self._condition.wait(timeout)
+                if self._stopping:
+                    return
+            try:
+                self.run_due()
+            except Exception as e:
+                logging.error(f"Lock expiry tick failed: {e}")
+
+_lock_scheduler = None
+_lock_scheduler_lock = threading.Lock()
+
+def get_lock_scheduler(store=None):
+    """Return the running lock scheduler over `store` (default: the current account store), starting it on first use."""
+    global _lock_scheduler
+    store = store or get_store()
+    with _lock_scheduler_lock:
+        if _lock_scheduler is None or _lock_scheduler.store is not store:
+            if _lock_scheduler is not None:
+                _lock_scheduler.stop()
+            _lock_scheduler = LockExpiryScheduler(store).start()
+        return _lock_scheduler
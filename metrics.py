@@ -0,0 +1,176 @@
+import os, time, atexit, bisect, functools, threading
+from atomic_io import atomic_write_bytes
+
+# Metrics are only collected when enabled; disabled timers and counters are a single flag check
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0") == "1"
+
+# When set, the Prometheus text dump is written to this file at exit
+METRICS_DUMP_PATH = os.environ.get("METRICS_DUMP_PATH")
+
+# Latency histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# ------------------ Histogram Class ------------------
+class Histogram:
+    """Fixed-bucket latency histogram (seconds), like a Prometheus histogram."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (inf if it is past the last bucket)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+# ------------------ MetricsRegistry Class ------------------
+class MetricsRegistry:
+    """Process-wide counters and latency histograms, with a snapshot and a Prometheus text dump."""
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        """Return {"counters": {...}, "histograms": {name: {count, sum, mean, p50, p95, p99}}} (times in seconds)."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {
+                    name: {
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+                        "p50": histogram.quantile(0.50),
+                        "p95": histogram.quantile(0.95),
+                        "p99": histogram.quantile(0.99)
+                    }
+                    for name, histogram in self.histograms.items()
+                }
+            }
+
+    def to_prometheus(self):
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines += [f"# TYPE {name}_total counter", f"{name}_total {value}"]
+            for name, histogram in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name}_seconds histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_seconds_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_seconds_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{name}_seconds_sum {histogram.sum}")
+                lines.append(f"{name}_seconds_count {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Atomically write the Prometheus text dump to `path`."""
+        atomic_write_bytes(path, self.to_prometheus().encode())
+
+registry = MetricsRegistry()
+
+# ------------------ Hooks ------------------
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        registry.observe(self.name, time.perf_counter() - self.start)
+        if exc_info[0] is not None:
+            registry.inc(self.name + "_errors")
+        return False
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_null_timer = _NullTimer()
+
+def timer(name):
+    """Context manager recording the duration of its block in the `name` histogram."""
+    return _Timer(name) if registry.enabled else _null_timer
+
+def timed(name):
+    """Decorator recording every call's duration in the `name` histogram."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return function(*args, **kwargs)
+            with _Timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count(name, amount=1):
+    """Add `amount` to the `name` counter."""
+    if registry.enabled:
+        registry.inc(name, amount)
+
+def value(name):
+    """Current value of the `name` counter (0 if it was never counted)."""
+    with registry._lock:
+        return registry.counters.get(name, 0)
+
+def enable(enabled=True):
+    registry.enabled = enabled
+
+def snapshot():
+    return registry.snapshot()
+
+def dump_prometheus(path=None):
+    """Write the Prometheus text dump to `path` (default METRICS_DUMP_PATH). Returns the path, or None."""
+    path = path or METRICS_DUMP_PATH
+    if path:
+        registry.dump(path)
+    return path
+
+@atexit.register
+def _dump_at_exit():
+    if registry.enabled and METRICS_DUMP_PATH:
+        registry.dump(METRICS_DUMP_PATH)
@@ -0,0 +1,78 @@
+import os, time, logging, threading, bcrypt
+from metrics import timed
+
+# bcrypt work factor (log2 of the rounds); each +1 doubles the time to hash and verify
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+
+# When set, the cost is calibrated so one hash/verify takes about this long on the current host
+BCRYPT_TARGET_MS = os.environ.get("BCRYPT_TARGET_MS")
+
+# ------------------ HashingPolicy Class ------------------
+class HashingPolicy:
+    """
+    The single place that decides how passwords are hashed.
+    Every hash is created with `rounds`; hashes made with another cost
+    are reported by needs_rehash() so they can be upgraded after a successful login.
+    """
+
+    MIN_ROUNDS = 4
+    MAX_ROUNDS = 31
+
+    def __init__(self, rounds=BCRYPT_ROUNDS, target_ms=None):
+        if target_ms:
+            rounds = self.calibrate(float(target_ms))
+        self.rounds = max(self.MIN_ROUNDS, min(self.MAX_ROUNDS, int(rounds)))
+
+    @classmethod
+    def calibrate(cls, target_ms, sample_rounds=8):
+        """
+        Return the highest cost whose hash time stays within `target_ms` on this host.
+        One hash is timed at `sample_rounds`; every extra round doubles that time.
+        """
+        start = time.perf_counter()
+        bcrypt.hashpw(b"calibration", bcrypt.gensalt(sample_rounds))
+        sample_ms = (time.perf_counter() - start) * 1000
+        rounds = sample_rounds
+        while rounds < cls.MAX_ROUNDS and sample_ms * 2 ** (rounds + 1 - sample_rounds) <= target_ms:
+            rounds += 1
+        while rounds > cls.MIN_ROUNDS and sample_ms * 2 ** (rounds - sample_rounds) > target_ms:
+            rounds -= 1
+        logging.info(f"Calibrated bcrypt cost to {rounds} for a {target_ms:.0f} ms target.")
+        return rounds
+
+    @timed("bcrypt_hashpw")
+    def hash(self, password):
+        # JSON only stores string data, so the hashed byte string is decoded back into a regular string
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(self.rounds)).decode()
+
+    @timed("bcrypt_checkpw")
+    def verify(self, password, hashed_password):
+        return bcrypt.checkpw(password.encode(), hashed_password.encode())
+
+    @staticmethod
+    def rounds_of(hashed_password):
+        """Cost stored in a bcrypt hash ($2b$<cost>$...), or None if it isn't one."""
+        try:
+            return int(hashed_password.split("$")[2])
+        except (IndexError, ValueError):
+            return None
+
+    def needs_rehash(self, hashed_password):
+        return self.rounds_of(hashed_password) != self.rounds
+
+_policy = None
+_policy_lock = threading.Lock()
+
+def get_policy():
+    """Return the process-wide HashingPolicy (calibrated on first use if BCRYPT_TARGET_MS is set)."""
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = HashingPolicy(BCRYPT_ROUNDS, target_ms=BCRYPT_TARGET_MS)
+        return _policy
+
+def set_policy(policy):
+    """Replace the process-wide HashingPolicy, e.g. with a low cost for benchmarks."""
+    global _policy
+    with _policy_lock:
+        _policy = policy
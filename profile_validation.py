@@ -0,0 +1,132 @@
+import re
+from metrics import timed
+
+# The account field rules, without any prompts. AccountManager.account_creation asks for each
+# field with these checks, and imports and API requests run them on whole profiles.
+
+# Patterns are compiled once at import instead of on every validation call
+# Phone number: exactly 10 digits, optionally with hyphens or spaces
+PHONE_PATTERN = re.compile(r"^(?=.*\d)(?:\(?\d{3}\)?[\s\-]?)?\d{3}[\s\-]?\d{4}$")
+# Password: at least 8 characters with one digit, one lowercase letter, one uppercase letter, and one special character
+PASSWORD_PATTERN = re.compile(r"^(?=.*\d)(?=.*[a-z])(?=.*[A-Z])(?=.*[!@#\$%\^&\*\(\)_\+\-=\[\]\{\};:'\",<>\./?]).{8,}$")
+EMAIL_PATTERN = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$")
+
+NAME_MIN_LENGTH, NAME_MAX_LENGTH = 3, 15
+USERNAME_MIN_LENGTH, USERNAME_MAX_LENGTH = 8, 15
+PHONE_PREFIXES = ("873", "514", "438", "263")
+EMAIL_DOMAINS = (".com", ".org", ".net", ".ca")
+ROLES = ("user", "admin")
+
+# Fields that must be unique across accounts
+UNIQUE_FIELDS = ("username", "email", "phone number")
+
+# ------------------ Field Validators ------------------
+def validate_name(label, name):
+    """Return the errors for a first or last name (`label` is e.g. "First name")."""
+    if not name:
+        return [f"🚫 {label} cannot be empty."]
+    if not name.isalpha():
+        return [f"❌ {label} should only contain letters."]
+    if len(name) < NAME_MIN_LENGTH:
+        return [f"⏬ {label} should be at least {NAME_MIN_LENGTH} characters long."]
+    if len(name) > NAME_MAX_LENGTH:
+        return [f"⏫ {label} should be at most {NAME_MAX_LENGTH} characters long."]
+    return []
+
+def validate_username(username):
+    if not username:
+        return ["🚫 Username cannot be empty."]
+    if not username.isalnum():
+        return ["❌ Usernames should only contain letters and numbers."]
+    if len(username) < USERNAME_MIN_LENGTH:
+        return [f"⏬ Username is too short (min {USERNAME_MIN_LENGTH} characters)."]
+    if len(username) > USERNAME_MAX_LENGTH:
+        return [f"⏫ Username is too long (max {USERNAME_MAX_LENGTH} characters)."]
+    return []
+
+def validate_phone_number(phone):
+    if not PHONE_PATTERN.fullmatch(phone):
+        return ["❌ Invalid phone number format."]
+    if not phone.startswith(PHONE_PREFIXES):
+        return ["❌ Phone number must start with 873, 514, 438, or 263."]
+    return []
+
+def validate_password(password):
+    if not PASSWORD_PATTERN.fullmatch(password):
+        return ["❌ Password must have at least 8 characters, including uppercase, lowercase, a digit, and a special character."]
+    return []
+
+def validate_email(email):
+    if not EMAIL_PATTERN.fullmatch(email):
+        return ["⚠️ Invalid email format."]
+    if not email.endswith(EMAIL_DOMAINS):
+        return ["⚠️ Email should end with .com, .org, .net, or .ca."]
+    return []
+
+# ------------------ Profile Validation ------------------
+def normalize_profile(profile):
+    """Return a copy of `profile` with its fields cleaned the way the prompts clean them."""
+    profile = dict(profile)
+    for field in ("first name", "last name"):
+        profile[field] = str(profile.get(field) or "").strip().title()
+    for field in ("username", "phone number", "password"):
+        profile[field] = str(profile.get(field) or "").strip()
+    profile["email"] = str(profile.get("email") or "").strip().lower()
+    profile["role"] = str(profile.get("role") or "user").strip().lower()
+    return profile
+
+# Field -> (label used in messages, validator) for validate_profile
+_PROFILE_FIELDS = {
+    "first name": ("First name", lambda value: validate_name("First name", value)),
+    "last name": ("Last name", lambda value: validate_name("Last name", value)),
+    "username": ("Username", validate_username),
+    "phone number": ("Phone number", validate_phone_number),
+    # A bcrypt hash (e.g. from an export) was checked when its password was chosen
+    "password": ("Password", lambda value: [] if value.startswith("$2b$") else validate_password(value)),
+    "email": ("Email", validate_email),
+    "role": ("Role", lambda value: [] if value in ROLES else [f"❌ Role must be one of: {', '.join(ROLES)}."])
+}
+
+def validate_profile(profile):
+    """
+    Check a normalized profile against the account creation rules.
+    Returns a list of error messages (empty when the profile is valid); a missing or
+    non-text field is reported as an error for that field instead of raising.
+    Uniqueness is not checked here; that needs the account store.
+    """
+    errors = []
+    for field, (label, validate) in _PROFILE_FIELDS.items():
+        value = profile.get(field)
+        if value is None:
+            errors.append(f"🚫 {label} is missing.")
+        elif not isinstance(value, str):
+            errors.append(f"❌ {label} must be text.")
+        else:
+            errors += validate(value)
+    return errors
+
+@timed("validate_many")
+def validate_many(profiles, normalize=True):
+    """
+    Validate a batch of profiles in one pass.
+    Returns one error list per profile, in order; besides the field rules, a profile whose
+    username, email or phone number repeats an earlier profile of the batch is reported.
+    With normalize=True the profiles are cleaned first (the given dicts are not modified).
+    """
+    seen = {field: set() for field in UNIQUE_FIELDS}
+    results = []
+    for profile in profiles:
+        if normalize:
+            profile = normalize_profile(profile)
+        errors = validate_profile(profile)
+        for field in UNIQUE_FIELDS:
+            # Missing or non-text values were reported by validate_profile
+            value = profile.get(field)
+            if not isinstance(value, str):
+                continue
+            key = value.lower()
+            if key and key in seen[field]:
+                errors.append(f"⚠️ This {field} appears more than once.")
+            seen[field].add(key)
+        results.append(errors)
+    return results
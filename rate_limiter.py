@@ -0,0 +1,137 @@
+import os, time, heapq, itertools, threading
+from datetime import datetime
+from helper import log_warning, update_account
+import audit_log
+from session_manager import get_session_manager
+
+# Login attempts allowed per minute for one username and for one source (e.g. an IP address)
+USER_ATTEMPTS_PER_MINUTE = int(os.environ.get("LOGIN_USER_ATTEMPTS_PER_MINUTE", "10"))
+SOURCE_ATTEMPTS_PER_MINUTE = int(os.environ.get("LOGIN_SOURCE_ATTEMPTS_PER_MINUTE", "60"))
+
+# Failed passwords within FAILURE_WINDOW_SECONDS that lock an account, and how long the lock lasts
+MAX_FAILED_ATTEMPTS = 3
+FAILURE_WINDOW_SECONDS = 15 * 60
+LOCKOUT_SECONDS = int(float(os.environ.get("LOCKOUT_MINUTES", "30")) * 60)
+
+# ------------------ TokenBucketLimiter Class ------------------
+class TokenBucketLimiter:
+    """
+    One token bucket per key: `rate` attempts per `per` seconds, refilled continuously.
+    allow() is O(1); full (idle) buckets are pruned once there are more than `max_keys`.
+    """
+
+    def __init__(self, rate, per=60.0, max_keys=100_000):
+        self.capacity = float(rate)
+        self.refill_per_second = rate / per
+        self.max_keys = max_keys
+        self._buckets = {}  # key -> [tokens, last_refill]
+        self._lock = threading.Lock()
+
+    def allow(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - last) * self.refill_per_second)
+            allowed = tokens >= 1
+            self._buckets[key] = [tokens - 1 if allowed else tokens, now]
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return allowed
+
+    def _prune(self, now):
+        full_after = self.capacity / self.refill_per_second
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < full_after}
+
+# ------------------ LockoutTracker Class ------------------
+class LockoutTracker:
+    """
+    Counts failed logins in memory (including attempts on usernames that don't exist)
+    and only persists the lock of real accounts; lock_scheduler persists the unlock.
+    Pending in-memory unlocks sit in a min-heap ordered by unlock time, so expiring them is O(log n).
+    Failure counts older than the window are pruned once there are more than `max_keys`,
+    so attempts on many distinct usernames can't grow memory without bound.
+    """
+
+    def __init__(self, max_failures=MAX_FAILED_ATTEMPTS, window_seconds=FAILURE_WINDOW_SECONDS,
+                 lockout_seconds=LOCKOUT_SECONDS, max_keys=100_000):
+        self.max_failures = max_failures
+        self.window_seconds = window_seconds
+        self.lockout_seconds = lockout_seconds
+        self.max_keys = max_keys
+        self._failures = {}       # username -> [count, first_failure_time]
+        self._locked_until = {}   # username -> unlock time (wall clock)
+        self._unlock_heap = []    # (unlock time, username)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(username):
+        return username.strip().lower()
+
+    def is_locked(self, username, now=None):
+        """True while an in-memory lock (real or unknown username) is active."""
+        now = time.time() if now is None else now
+        return self._locked_until.get(self._key(username), 0) > now
+
+    def record_failure(self, username, account=None, now=None):
+        """Count a failed attempt. Returns True if this failure locked the username."""
+        now = time.time() if now is None else now
+        key = self._key(username)
+        with self._lock:
+            count, first = self._failures.get(key, (0, now))
+            if now - first > self.window_seconds:
+                count, first = 0, now
+            count += 1
+            if count < self.max_failures:
+                self._failures[key] = [count, first]
+                if len(self._failures) > self.max_keys:
+                    self._prune(now)
+                return False
+            self._failures.pop(key, None)
+        self.lock(username, account, now)
+        return True
+
+    def _prune(self, now):
+        self._failures = {key: entry for key, entry in self._failures.items() if now - entry[1] <= self.window_seconds}
+        # Still full of live counts (a flood within one window): forget the oldest ones
+        # down to 90% so the next prune is far off
+        excess = len(self._failures) - int(self.max_keys * 0.9)
+        if excess > 0:
+            for key in list(itertools.islice(self._failures, excess)):
+                del self._failures[key]
+
+    def record_success(self, username):
+        with self._lock:
+            self._failures.pop(self._key(username), None)
+
+    def lock(self, username, account=None, now=None):
+        """Lock a username; for a real account the lock is persisted (one delta write)."""
+        now = time.time() if now is None else now
+        key = self._key(username)
+        unlock_at = now + self.lockout_seconds
+        with self._lock:
+            self._locked_until[key] = unlock_at
+            heapq.heappush(self._unlock_heap, (unlock_at, key))
+        if account is None:
+            log_warning(f"Login attempts throttled for unknown username: {username}")
+        elif not account.get("is_locked"):
+            lock_fields = {"is_locked": True, "lock_time": datetime.fromtimestamp(now).isoformat()}
+            update_account(account, lock_fields, log_message=f"User {account['username']} locked out.")
+            audit_log.record_event(audit_log.ACCOUNT_LOCKED, account["username"], reason="failed_logins")
+            get_session_manager().revoke_user(account["username"])
+
+    def expire_due(self, now=None):
+        """
+        Release every in-memory lock whose time is up (the store is left to the lock scheduler).
+        Returns how many were released.
+        """
+        now = time.time() if now is None else now
+        released = 0
+        with self._lock:
+            while self._unlock_heap and self._unlock_heap[0][0] <= now:
+                unlock_at, key = heapq.heappop(self._unlock_heap)
+                # Skip stale heap entries superseded by a later lock of the same username
+                if self._locked_until.get(key) != unlock_at:
+                    continue
+                del self._locked_until[key]
+                released += 1
+        return released
@@ -0,0 +1,133 @@
+import os, hmac, time, hashlib, logging, secrets, threading
+from collections import OrderedDict
+
+# Key used to sign session tokens; without SESSION_SECRET a random one is made per process,
+# so tokens then only survive as long as the process that issued them (like the session cache itself)
+SESSION_SECRET = os.environ.get("SESSION_SECRET")
+
+# Sessions expire this many seconds after login
+SESSION_TTL_SECONDS = int(os.environ.get("SESSION_TTL_SECONDS", str(30 * 60)))
+
+# At most this many live sessions are cached; the least recently used one is evicted first
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", "10000"))
+
+# ------------------ Session Class ------------------
+class Session:
+    """One logged-in user. `account` is the store's own record, not a copy."""
+
+    __slots__ = ("token", "username", "account", "created", "expires")
+
+    def __init__(self, token, account, created, expires):
+        self.token = token
+        self.username = account["username"]
+        self.account = account
+        self.created = created
+        self.expires = expires
+
+    @property
+    def is_admin(self):
+        return self.account.get("role", "user").lower() == "admin"
+
+# ------------------ SessionManager Class ------------------
+class SessionManager:
+    """
+    Issues signed, expiring session tokens and keeps the sessions in an LRU + TTL cache.
+    A token is "<session id>.<expiry>.<hmac-sha256 signature>", so forged or expired tokens
+    are rejected before the cache is touched, and a valid one is an O(1) lookup: no bcrypt, no file read.
+    """
+
+    def __init__(self, secret=None, ttl_seconds=None, max_sessions=None):
+        secret = secret or SESSION_SECRET or secrets.token_bytes(32)
+        self._secret = secret.encode() if isinstance(secret, str) else secret
+        self.ttl_seconds = ttl_seconds or SESSION_TTL_SECONDS
+        self.max_sessions = max_sessions or SESSION_CACHE_SIZE
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # token -> Session, least recently used first
+        self._by_username = {}          # lowercase username -> set of tokens
+
+    def _sign(self, session_id, expires):
+        return hmac.new(self._secret, f"{session_id}.{expires}".encode(), hashlib.sha256).hexdigest()
+
+    def issue(self, account, now=None):
+        """Start a session for a successfully authenticated account and return its token."""
+        now = time.time() if now is None else now
+        expires = int(now + self.ttl_seconds)
+        session_id = secrets.token_urlsafe(16)
+        token = f"{session_id}.{expires}.{self._sign(session_id, expires)}"
+        session = Session(token, account, now, expires)
+        with self._lock:
+            self._sessions[token] = session
+            self._by_username.setdefault(session.username.lower(), set()).add(token)
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                self._forget(evicted)
+        logging.info(f"Session started for user: {session.username}.")
+        return token
+
+    def _forget(self, session):
+        tokens = self._by_username.get(session.username.lower())
+        if tokens is not None:
+            tokens.discard(session.token)
+            if not tokens:
+                del self._by_username[session.username.lower()]
+
+    def validate(self, token, now=None):
+        """Return the live Session for `token`, or None if it is forged, expired, revoked or evicted."""
+        try:
+            session_id, expires, signature = token.split(".")
+            expires = int(expires)
+        except (AttributeError, ValueError):
+            return None
+        if not hmac.compare_digest(signature, self._sign(session_id, expires)):
+            return None
+        now = time.time() if now is None else now
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                return None
+            if expires <= now:
+                del self._sessions[token]
+                self._forget(session)
+                return None
+            self._sessions.move_to_end(token)
+            return session
+
+    def revoke(self, token):
+        """End one session (log out). Returns True if it existed."""
+        with self._lock:
+            session = self._sessions.pop(token, None)
+            if session is not None:
+                self._forget(session)
+        return session is not None
+
+    def revoke_user(self, username):
+        """End every session of a user, e.g. when the account is removed or locked."""
+        with self._lock:
+            tokens = self._by_username.pop(username.strip().lower(), set())
+            for token in tokens:
+                self._sessions.pop(token, None)
+        return len(tokens)
+
+    def purge_expired(self, now=None):
+        """Drop every expired session. Returns how many were dropped."""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [session for session in self._sessions.values() if session.expires <= now]
+            for session in expired:
+                del self._sessions[session.token]
+                self._forget(session)
+        return len(expired)
+
+    def __len__(self):
+        return len(self._sessions)
+
+_session_manager = None
+_session_manager_lock = threading.Lock()
+
+def get_session_manager():
+    """Return the process-wide SessionManager, creating it on first use."""
+    global _session_manager
+    with _session_manager_lock:
+        if _session_manager is None:
+            _session_manager = SessionManager()
+        return _session_manager
@@ -0,0 +1,353 @@
+import os, sys, json, sqlite3, logging, threading
+import account_storage
+from account_storage import AccountBackend, AccountStore, DuplicateAccountError
+from to_do_list import TaskBackend, JsonTaskStore
+
+# SQLite database holding both accounts and to-do lists
+DB_PATH = os.environ.get(
+    "SQLITE_DB_PATH",
+    os.path.join(os.path.dirname(account_storage.FILE_PATH), "user_management.db")
+)
+
+# Indexed account fields are copied into their own columns; the full account lives in `data`
+COLUMNS = {"username": "username", "email": "email", "phone number": "phone_number"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    email TEXT,
+    phone_number TEXT,
+    data TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS accounts_username ON accounts (lower(username));
+CREATE UNIQUE INDEX IF NOT EXISTS accounts_email ON accounts (lower(email));
+CREATE UNIQUE INDEX IF NOT EXISTS accounts_phone_number ON accounts (phone_number);
+CREATE TABLE IF NOT EXISTS tasks (
+    username TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    task TEXT NOT NULL,
+    PRIMARY KEY (username, position)
+);
+"""
+
+def _duplicate(error):
+    """The DuplicateAccountError for an IntegrityError raised by one of the unique indexes."""
+    fields = [field for field, column in COLUMNS.items() if column in str(error)]
+    return DuplicateAccountError(fields or list(COLUMNS), str(error))
+
+def connect(db_path):
+    """Open a connection in WAL mode so readers never block the writer."""
+    connection = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+_shared = {}  # absolute database path -> (connection, lock)
+_shared_lock = threading.Lock()
+
+def shared_connection(db_path):
+    """
+    The process-wide (connection, lock) for a database, shared by the account and task stores.
+    PRAGMA data_version only changes for commits made on other connections, so with one
+    connection per process a to-do save no longer looks like an outside change to the accounts.
+    """
+    key = os.path.abspath(db_path)
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = (connect(db_path), threading.RLock())
+        return _shared[key]
+
+# ------------------ SqliteAccountStore Class ------------------
+class SqliteAccountStore(AccountBackend):
+    """
+    Account backend on a stdlib sqlite3 database.
+    Lookups go through the unique indexes on lower(username), lower(email) and phone number.
+    Account dicts are cached by username so callers keep sharing one record per account,
+    and the cache is dropped whenever another process commits.
+    """
+
+    def __init__(self, db_path):
+        self.file_path = db_path
+        self._connection, self._lock = shared_connection(db_path)
+        self._cache = {}
+        self._data_version = None
+        self._listeners = []
+
+    def locked(self):
+        # The connection's lock: in this process, checks and writes made under it can't interleave.
+        # Other processes are only stopped by the unique indexes (DuplicateAccountError).
+        return self._lock
+
+    @staticmethod
+    def _columns(account):
+        return (
+            str(account["username"]).strip(),
+            account.get("email") and str(account["email"]).strip(),
+            account.get("phone number") and str(account["phone number"]).strip(),
+            json.dumps(account)
+        )
+
+    def _cached(self, data):
+        account = json.loads(data)
+        key = self._normalize(account["username"])
+        return self._cache.setdefault(key, account)
+
+    def refresh(self):
+        with self._lock:
+            # data_version changes when another connection (i.e. another process) commits
+            data_version = self._connection.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._cache.clear()
+                self._data_version = data_version
+                for listener in self._listeners:
+                    listener.rebuild(self.iter_accounts)
+
+    def add_listener(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+            listener.rebuild(self.iter_accounts)
+
+    def _notify(self, event, account):
+        for listener in self._listeners:
+            getattr(listener, event)(account)
+
+    def accounts(self):
+        with self._lock:
+            self.refresh()
+            rows = self._connection.execute("SELECT data FROM accounts ORDER BY id")
+            return [self._cached(data) for (data,) in rows]
+
+    def find(self, field, value):
+        with self._lock:
+            self.refresh()
+            if field == "username" and self._normalize(value) in self._cache:
+                return self._cache[self._normalize(value)]
+            if field == "phone number":
+                query, param = "SELECT data FROM accounts WHERE phone_number = ?", str(value).strip()
+            else:
+                column = COLUMNS[field]
+                query, param = f"SELECT data FROM accounts WHERE lower({column}) = ?", self._normalize(value)
+            row = self._connection.execute(query, (param,)).fetchone()
+            return self._cached(row[0]) if row else None
+
+    def add(self, account):
+        with self._lock:
+            self.refresh()
+            try:
+                self._connection.execute(
+                    "INSERT INTO accounts (username, email, phone_number, data) VALUES (?, ?, ?, ?)",
+                    self._columns(account)
+                )
+            except sqlite3.IntegrityError as e:
+                logging.warning(f"Duplicate account rejected for {account['username']}: {e}")
+                raise _duplicate(e) from e
+            self._cache[self._normalize(account["username"])] = account
+            self._notify("add", account)
+
+    def add_many(self, accounts):
+        """Insert several accounts in one transaction; a duplicate rolls back the whole batch."""
+        with self._lock:
+            self.refresh()
+            try:
+                with self._connection:
+                    self._connection.execute("BEGIN")
+                    self._connection.executemany(
+                        "INSERT INTO accounts (username, email, phone_number, data) VALUES (?, ?, ?, ?)",
+                        (self._columns(account) for account in accounts)
+                    )
+            except sqlite3.IntegrityError as e:
+                logging.warning(f"Batch of {len(accounts)} account(s) rolled back: {e}")
+                raise _duplicate(e) from e
+            for account in accounts:
+                self._cache[self._normalize(account["username"])] = account
+                self._notify("add", account)
+
+    def iter_accounts(self):
+        """Stream the accounts from their own connection instead of building the whole list."""
+        connection = sqlite3.connect(self.file_path)
+        try:
+            for (data,) in connection.execute("SELECT data FROM accounts ORDER BY id"):
+                yield json.loads(data)
+        finally:
+            connection.close()
+
+    def sorted_page(self, sort="username", descending=False, after=None, limit=20):
+        """Username order is read straight from the lower(username) index (keyset pagination)."""
+        if sort != "username":
+            return super().sorted_page(sort, descending, after, limit)
+        compare, order = ("<", "DESC") if descending else (">", "ASC")
+        where = f"WHERE lower(username) {compare} ?" if after else ""
+        params = (after[1], limit) if after else (limit,)
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT data FROM accounts {where} ORDER BY lower(username) {order} LIMIT ?", params
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    @staticmethod
+    def _changed(account, changes, unset):
+        updated = dict(account)
+        updated.update(changes)
+        for field in unset:
+            updated.pop(field, None)
+        return updated
+
+    def update(self, account, changes, unset=()):
+        """The row is written from a copy first, so a rejected update (DuplicateAccountError) leaves memory untouched."""
+        with self._lock:
+            stored = self.find("username", account["username"])
+            if stored is None:
+                logging.warning(f"Cannot update missing account: {account['username']}")
+                return
+            try:
+                self._connection.execute(
+                    "UPDATE accounts SET username = ?, email = ?, phone_number = ?, data = ? WHERE lower(username) = ?",
+                    self._columns(self._changed(stored, changes, unset)) + (self._normalize(account["username"]),)
+                )
+            except sqlite3.IntegrityError as e:
+                logging.warning(f"Update rejected for {account['username']}: {e}")
+                raise _duplicate(e) from e
+            self._notify("discard", stored)
+            for target in (stored, account):
+                target.update(changes)
+                for field in unset:
+                    target.pop(field, None)
+            self._notify("add", stored)
+
+    def update_many(self, updates):
+        """Apply several updates in one transaction; memory only changes once it has committed."""
+        with self._lock:
+            self.refresh()
+            written, pending = [], {}  # pending: lowercase username -> record as written so far
+            try:
+                with self._connection:
+                    self._connection.execute("BEGIN")
+                    for account, changes, unset in updates:
+                        stored = self.find("username", account["username"])
+                        if stored is None:
+                            logging.warning(f"Cannot update missing account: {account['username']}")
+                            continue
+                        key = self._normalize(account["username"])
+                        pending[key] = self._changed(pending.get(key, stored), changes, unset)
+                        self._connection.execute(
+                            "UPDATE accounts SET username = ?, email = ?, phone_number = ?, data = ? WHERE lower(username) = ?",
+                            self._columns(pending[key]) + (key,)
+                        )
+                        written.append((stored, account, changes, unset))
+            except sqlite3.IntegrityError as e:
+                logging.warning(f"Batch of {len(updates)} update(s) rolled back: {e}")
+                raise _duplicate(e) from e
+            for stored, account, changes, unset in written:
+                self._notify("discard", stored)
+                for target in (stored, account):
+                    target.update(changes)
+                    for field in unset:
+                        target.pop(field, None)
+                self._notify("add", stored)
+
+    def remove(self, account):
+        with self._lock:
+            key = self._normalize(account["username"])
+            self._connection.execute("DELETE FROM accounts WHERE lower(username) = ?", (key,))
+            self._cache.pop(key, None)
+            self._notify("discard", account)
+
+    def replace_all(self, accounts):
+        with self._lock:
+            with self._connection:
+                self._connection.execute("BEGIN")
+                self._connection.execute("DELETE FROM accounts")
+                self._connection.executemany(
+                    "INSERT INTO accounts (username, email, phone_number, data) VALUES (?, ?, ?, ?)",
+                    (self._columns(account) for account in accounts)
+                )
+            self._cache = {self._normalize(account["username"]): account for account in accounts}
+            for listener in self._listeners:
+                listener.rebuild(self.iter_accounts)
+
+# ------------------ SqliteTaskStore Class ------------------
+def _encode_task(task):
+    return json.dumps(task)
+
+def _decode_task(value):
+    # Rows imported before tasks became records hold the bare task string
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+class SqliteTaskStore(TaskBackend):
+    """To-do backend with one row per task (stored as JSON), so a save only touches that user's rows."""
+
+    def __init__(self, db_path):
+        self.file_path = db_path
+        self._connection, self._lock = shared_connection(db_path)
+
+    def load(self):
+        with self._lock:
+            all_tasks = {}
+            rows = self._connection.execute("SELECT username, task FROM tasks ORDER BY username, position")
+            for username, task in rows:
+                all_tasks.setdefault(username, []).append(_decode_task(task))
+            return all_tasks
+
+    def get(self, username):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT task FROM tasks WHERE username = ? ORDER BY position", (username,)
+            )
+            return [_decode_task(task) for (task,) in rows]
+
+    def save(self, username, tasks):
+        with self._lock:
+            with self._connection:
+                self._connection.execute("BEGIN")
+                self._connection.execute("DELETE FROM tasks WHERE username = ?", (username,))
+                self._connection.executemany(
+                    "INSERT INTO tasks (username, position, task) VALUES (?, ?, ?)",
+                    ((username, position, _encode_task(task)) for position, task in enumerate(tasks))
+                )
+
+    def delete(self, username):
+        with self._lock:
+            self._connection.execute("DELETE FROM tasks WHERE username = ?", (username,))
+
+    def users(self):
+        with self._lock:
+            return [username for (username,) in self._connection.execute("SELECT DISTINCT username FROM tasks")]
+
+# ------------------ JSON -> SQLite Migration ------------------
+def import_json_files(accounts_path, tasks_path, db_path):
+    """
+    Copy the accounts and to-do JSON files into the SQLite database.
+    Accounts whose username, email or phone number is already in the database are skipped.
+    Returns (accounts imported, users with tasks imported).
+    """
+    accounts = AccountStore(accounts_path).accounts()
+    account_store = SqliteAccountStore(db_path)
+    imported = 0
+    for account in accounts:
+        try:
+            account_store.add(account)
+            imported += 1
+        except DuplicateAccountError:
+            print(f"⚠️ Skipped duplicate account: {account['username']}")
+    all_tasks = JsonTaskStore(tasks_path).load()
+    SqliteTaskStore(db_path).replace_all(all_tasks)
+    logging.info(f"Imported {imported} account(s) and {len(all_tasks)} task list(s) into {db_path}.")
+    return imported, len(all_tasks)
+
+if __name__ == "__main__":
+    # Usage: python sqlite_storage.py migrate [accounts.json] [to_do_list.json] [database.db]
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("Usage: python sqlite_storage.py migrate [accounts.json] [to_do_list.json] [database.db]")
+        sys.exit(1)
+    import to_do_list
+    if to_do_list.TASKS_BACKEND == "json":
+        # Fold pending to-do op logs into the JSON file before importing it
+        to_do_list.get_task_oplog().compact_all()
+    paths = sys.argv[2:] + [account_storage.FILE_PATH, to_do_list.TASKS_FILE_PATH, DB_PATH][len(sys.argv[2:]):]
+    accounts_imported, task_lists_imported = import_json_files(*paths[:3])
+    print(f"✅ Imported {accounts_imported} account(s) and {task_lists_imported} task list(s) into {paths[2]}")
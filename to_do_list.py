@@ -1,46 +1,541 @@
-import os, json
+import os, sys, json, hashlib, threading
+from datetime import datetime
+from atomic_io import atomic_write_json, atomic_write_encoded, file_lock, GroupCommitWriter
+import codec
+import audit_log
+from metrics import timed
 
 # File path to save the tasks
-TASKS_FILE_PATH = r"c:\Users\ARZ\Desktop\USER MANAGEMENT\to_do_list.json"
+TASKS_FILE_PATH = os.environ.get("TASKS_FILE_PATH", r"c:\Users\ARZ\Desktop\USER MANAGEMENT\to_do_list.json")
+
+# "json" keeps every user's tasks in TASKS_FILE_PATH; "sharded" keeps one file per user in TASKS_SHARD_DIR;
+# "sqlite" keeps one row per task in sqlite_storage.DB_PATH
+TASKS_BACKEND = os.environ.get("TASKS_BACKEND", os.environ.get("STORAGE_BACKEND", "json"))
+
+# Directory holding one task file per user plus a manifest of the users that have one
+TASKS_SHARD_DIR = os.environ.get("TASKS_SHARD_DIR", os.path.splitext(TASKS_FILE_PATH)[0] + "_shards")
+
+# Directory holding one append-only log of task operations per user, replayed on top of the backend
+TASKS_OPLOG_DIR = os.environ.get("TASKS_OPLOG_DIR", os.path.splitext(TASKS_FILE_PATH)[0] + "_oplog")
+
+# Size in bytes past which a user's op log is folded into a snapshot in the task backend
+TASKS_OPLOG_COMPACT_BYTES = int(os.environ.get("TASKS_OPLOG_COMPACT_BYTES", 64 * 1024))
+
+# ------------------ TaskBackend Interface ------------------
+class TaskBackend:
+    """
+    Interface shared by every to-do storage backend:
+    load -> load(), get-by-key -> get(), insert/update -> save(),
+    delete -> delete(), list -> users().
+    """
+
+    def load(self):
+        """Return {username: [tasks]} for every user."""
+        raise NotImplementedError
+
+    def get(self, username):
+        """Return the task list of one user (empty if they have none)."""
+        raise NotImplementedError
+
+    def save(self, username, tasks):
+        """Store the task list of one user, replacing the previous one."""
+        raise NotImplementedError
+
+    def delete(self, username):
+        raise NotImplementedError
+
+    def users(self):
+        """Return the usernames that have a task list."""
+        raise NotImplementedError
+
+    def replace_all(self, all_tasks):
+        """Store {username: [tasks]} for several users at once."""
+        for username, tasks in all_tasks.items():
+            self.save(username, tasks)
+
+    def flush(self):
+        """Persist any saves still waiting for a group commit."""
+
+# ------------------ JsonTaskStore Class ------------------
+class JsonTaskStore(TaskBackend):
+    """
+    The original single JSON file holding every user's tasks.
+    Saves are kept as per-user deltas and merged into the file under its lock,
+    so two processes saving different users never overwrite each other.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._lock = threading.RLock()
+        self._file_lock = file_lock(file_path)
+        # {username: tasks or None (deleted)} saved but not yet written to the file
+        self._pending = {}
+        self._writer = GroupCommitWriter(self._flush)
+
+    def _read(self):
+        try:
+            data = codec.load_existing(self.file_path)
+        except FileNotFoundError:
+            return {}
+        # An unreadable file raises rather than reading as empty, so a save never overwrites it
+        if not isinstance(data, dict):
+            raise codec.UnreadableFileError(self.file_path, "not a tasks snapshot")
+        return data
+
+    def _merge(self, all_tasks):
+        for username, tasks in self._pending.items():
+            if tasks is None:
+                all_tasks.pop(username, None)
+            else:
+                all_tasks[username] = tasks
+        return all_tasks
+
+    def _flush(self):
+        with self._lock, self._file_lock:
+            if self._pending:
+                # Re-read under the lock so other processes' saves are kept
+                atomic_write_encoded(self.file_path, self._merge(self._read()))
+                self._pending = {}
+
+    def load(self):
+        with self._lock:
+            return self._merge(self._read())
+
+    def get(self, username):
+        with self._lock:
+            if username in self._pending:
+                return self._pending[username] or []
+            return self._read().get(username, [])
+
+    def save(self, username, tasks):
+        with self._lock:
+            self._pending[username] = tasks
+        self._writer.request()
+
+    def delete(self, username):
+        with self._lock:
+            self._pending[username] = None
+        self._writer.request()
+
+    def users(self):
+        return list(self.load())
+
+    def flush(self):
+        self._writer.flush()
+
+    def replace_all(self, all_tasks):
+        with self._lock:
+            self._pending.update(all_tasks)
+        self._writer.request()
+
+# ------------------ ShardedTaskStore Class ------------------
+class ShardedTaskStore(TaskBackend):
+    """
+    One small JSON file per user, named by a hash of the username, plus a manifest.
+    Loading or saving one user's tasks only touches that user's shard;
+    the manifest is rewritten only when a user gains or loses their shard.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, directory):
+        self.file_path = directory
+        self.manifest_path = os.path.join(directory, self.MANIFEST)
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._file_lock = file_lock(self.manifest_path)
+        self._users = None  # cached manifest: {username: shard file name}
+
+    @staticmethod
+    def shard_name(username):
+        return hashlib.sha1(username.encode()).hexdigest()[:20] + ".json"
+
+    def _shard_path(self, username):
+        return os.path.join(self.file_path, self.shard_name(username))
+
+    def _read_manifest(self):
+        try:
+            data = codec.load_existing(self.manifest_path)
+        except FileNotFoundError:
+            return {}
+        if not isinstance(data, dict) or not isinstance(data.get("users", {}), dict):
+            raise codec.UnreadableFileError(self.manifest_path, "not a shard manifest")
+        return data.get("users", {})
+
+    def _update_manifest(self, username, present):
+        with self._lock, self._file_lock:
+            # Re-read under the lock so users added by other processes are kept
+            users = self._read_manifest()
+            if present:
+                users[username] = self.shard_name(username)
+            else:
+                users.pop(username, None)
+            atomic_write_json(self.manifest_path, {"users": users})
+            self._users = users
+
+    def _manifest(self):
+        with self._lock:
+            if self._users is None:
+                self._users = self._read_manifest()
+            return self._users
+
+    def users(self):
+        return list(self._manifest())
+
+    def get(self, username):
+        path = self._shard_path(username)
+        try:
+            data = codec.load_existing(path)
+        except FileNotFoundError:
+            return []
+        if not isinstance(data, dict):
+            raise codec.UnreadableFileError(path, "not a task shard")
+        # Guard against a hash collision between two usernames
+        return data.get("tasks", []) if data.get("username") == username else []
+
+    def load(self):
+        return {username: self.get(username) for username in self.users()}
+
+    def save(self, username, tasks):
+        atomic_write_encoded(self._shard_path(username), {"username": username, "tasks": tasks})
+        # O(1) membership test against the cached manifest dict
+        if username not in self._manifest():
+            self._update_manifest(username, True)
+
+    def delete(self, username):
+        try:
+            os.remove(self._shard_path(username))
+        except FileNotFoundError:
+            pass
+        self._update_manifest(username, False)
+
+    def replace_all(self, all_tasks):
+        for username, tasks in all_tasks.items():
+            atomic_write_encoded(self._shard_path(username), {"username": username, "tasks": tasks})
+        with self._lock, self._file_lock:
+            users = self._read_manifest()
+            users.update({username: self.shard_name(username) for username in all_tasks})
+            atomic_write_json(self.manifest_path, {"users": users})
+            self._users = users
+
+def split_tasks_file(tasks_path, shard_dir):
+    """Migrate the monolithic tasks JSON file into per-user shards. Returns the number of users."""
+    all_tasks = JsonTaskStore(tasks_path).load()
+    ShardedTaskStore(shard_dir).replace_all(all_tasks)
+    return len(all_tasks)
+
+_task_store = None
+_task_store_lock = threading.Lock()
+
+def get_task_store():
+    """Return the process-wide task backend selected by TASKS_BACKEND, creating it on first use."""
+    global _task_store
+    with _task_store_lock:
+        if TASKS_BACKEND == "sqlite":
+            import sqlite_storage
+            if not isinstance(_task_store, sqlite_storage.SqliteTaskStore) or _task_store.file_path != sqlite_storage.DB_PATH:
+                _task_store = sqlite_storage.SqliteTaskStore(sqlite_storage.DB_PATH)
+        elif TASKS_BACKEND == "sharded":
+            if not isinstance(_task_store, ShardedTaskStore) or _task_store.file_path != TASKS_SHARD_DIR:
+                _task_store = ShardedTaskStore(TASKS_SHARD_DIR)
+        elif not isinstance(_task_store, JsonTaskStore) or _task_store.file_path != TASKS_FILE_PATH:
+            _task_store = JsonTaskStore(TASKS_FILE_PATH)
+        return _task_store
+
+_task_oplog = None
+
+def get_task_oplog():
+    """Return the process-wide op log over the current task backend, creating it on first use."""
+    global _task_oplog
+    store = get_task_store()
+    with _task_store_lock:
+        if _task_oplog is None or _task_oplog.store is not store or _task_oplog.directory != TASKS_OPLOG_DIR:
+            _task_oplog = TaskOpLog(TASKS_OPLOG_DIR, store)
+        return _task_oplog
+
+# ------------------ Task Class ------------------
+class Task:
+    """One to-do item. __slots__ keeps thousands of them compact in memory."""
+
+    __slots__ = ("id", "text", "done", "priority", "created", "updated")
+
+    def __init__(self, id, text, done=False, priority=0, created=None, updated=None):
+        now = datetime.now().isoformat()
+        self.id = id
+        self.text = text
+        self.done = done
+        self.priority = priority
+        self.created = created or now
+        self.updated = updated or self.created
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_record(cls, record, task_id):
+        """Build a Task from a stored record: a dict, or a legacy string ("✅ " prefix = done)."""
+        if isinstance(record, dict):
+            return cls(**{slot: record[slot] for slot in cls.__slots__ if slot in record})
+        done = record.startswith("✅")
+        text = record[len("✅"):].strip() if done else record
+        return cls(task_id, text, done=done)
+
+# ------------------ TaskList Class ------------------
+class TaskList:
+    """
+    One user's tasks, in insertion order.
+    An id -> task index makes remove/complete by id O(1),
+    and a set of task texts makes the duplicate check O(1).
+    Ids are never reused: the next id is a high-water mark kept in the snapshot
+    (a trailing {"next_id": n} record) and on remove operations, not max(id) + 1.
+    """
+
+    def __init__(self, tasks=()):
+        self._by_id = {}
+        self._texts = set()
+        self._next_id = 1
+        self._ops = []  # add/remove/complete operations not yet persisted
+        for task in tasks:
+            self._insert(task)
+
+    @classmethod
+    def from_records(cls, records):
+        """Load stored records, including the legacy list-of-strings format."""
+        task_list = cls()
+        for record in records:
+            if isinstance(record, dict) and "text" not in record:
+                task_list._next_id = max(task_list._next_id, record.get("next_id", 1))
+                continue
+            task_list._insert(Task.from_record(record, task_list._next_id))
+        return task_list
+
+    def to_records(self):
+        return [task.to_dict() for task in self._by_id.values()]
+
+    def to_snapshot(self):
+        """to_records() plus the next-id mark when removed tasks held the highest ids."""
+        records = self.to_records()
+        if self._next_id > max(self._by_id, default=0) + 1:
+            records.append({"next_id": self._next_id})
+        return records
+
+    def _insert(self, task):
+        previous = self._by_id.get(task.id)
+        if previous is not None:
+            self._texts.discard(previous.text)
+        self._by_id[task.id] = task
+        self._texts.add(task.text)
+        self._next_id = max(self._next_id, task.id + 1)
+
+    def drain_ops(self):
+        """Return the operations made since the last call and forget them."""
+        ops, self._ops = self._ops, []
+        return ops
+
+    def apply(self, op):
+        """Replay one logged operation. Replaying the same op twice has no further effect."""
+        if op["op"] == "add":
+            self._insert(Task.from_record(op["task"], op["task"]["id"]))
+        elif op["op"] == "remove":
+            self._next_id = max(self._next_id, op.get("next_id", 1))
+            task = self._by_id.pop(op["id"], None)
+            if task is not None:
+                self._texts.discard(task.text)
+        elif op["op"] == "complete":
+            task = self._by_id.get(op["id"])
+            if task is not None:
+                task.done = True
+                task.updated = op["updated"]
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, text):
+        return text in self._texts
+
+    def get(self, task_id):
+        return self._by_id.get(task_id)
+
+    def add(self, text, priority=0):
+        """Add a task; returns it, or None if a task with the same text already exists."""
+        if text in self._texts:
+            return None
+        task = Task(self._next_id, text, priority=priority)
+        self._insert(task)
+        self._ops.append({"op": "add", "task": task.to_dict()})
+        return task
+
+    def remove(self, task_id):
+        """Remove a task by id; returns it, or None if there is no such task."""
+        task = self._by_id.pop(task_id, None)
+        if task is not None:
+            self._texts.discard(task.text)
+            self._ops.append({"op": "remove", "id": task_id, "next_id": self._next_id})
+        return task
+
+    def complete(self, task_id):
+        """Mark a task done; returns it, or None if there is no such task."""
+        task = self._by_id.get(task_id)
+        if task is not None and not task.done:
+            task.done = True
+            task.updated = datetime.now().isoformat()
+            self._ops.append({"op": "complete", "id": task_id, "updated": task.updated})
+        return task
+
+# ------------------ TaskOpLog Class ------------------
+class TaskOpLog:
+    """
+    Per-user append-only JSON-lines log of task operations (add/remove/complete by id),
+    replayed on top of the snapshot kept in the task backend.
+    A save appends only the new operations, so its cost does not grow with the list.
+    Appends are batched through a GroupCommitWriter, and once a user's log passes
+    compact_bytes it is folded into a new snapshot and emptied.
+    """
+
+    def __init__(self, directory, store, compact_bytes=None):
+        self.directory = directory
+        self.store = store
+        self.compact_bytes = TASKS_OPLOG_COMPACT_BYTES if compact_bytes is None else compact_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._pending = {}  # {username: [ops]} not yet appended to the log
+        self._writer = GroupCommitWriter(self._flush)
+
+    def _log_path(self, username):
+        return os.path.join(self.directory, hashlib.sha1(username.encode()).hexdigest()[:20] + ".log")
+
+    def _read_ops(self, path, username=None):
+        ops = []
+        try:
+            with open(path, "rb") as file:
+                for line in file:
+                    # A torn line from a crash is skipped; the next append starts on a new line
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        continue
+                    # Guard against a hash collision between two usernames
+                    if username is None or op.get("user") == username:
+                        ops.append(op)
+        except FileNotFoundError:
+            pass
+        return ops
+
+    def load(self, username):
+        """Return the user's TaskList: the backend snapshot with their logged operations replayed."""
+        with self._lock, file_lock(self._log_path(username)):
+            task_list = TaskList.from_records(self.store.get(username))
+            for op in self._read_ops(self._log_path(username), username) + self._pending.get(username, []):
+                task_list.apply(op)
+            return task_list
+
+    def append(self, username, ops):
+        """Queue operations for the user's log; they are written with the next group commit."""
+        if not ops:
+            return
+        with self._lock:
+            self._pending.setdefault(username, []).extend(dict(op, user=username) for op in ops)
+        self._writer.request()
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            for username, ops in pending.items():
+                path = self._log_path(username)
+                data = b"".join(json.dumps(op).encode() + b"\n" for op in ops)
+                with file_lock(path):
+                    with open(path, "a+b") as file:
+                        if file.seek(0, os.SEEK_END):
+                            file.seek(-1, os.SEEK_END)
+                            if file.read(1) != b"\n":
+                                data = b"\n" + data  # close a torn line left by a crash
+                        file.write(data)
+                        file.flush()
+                        os.fsync(file.fileno())
+                    size = os.path.getsize(path)
+                if size >= self.compact_bytes:
+                    self.save_snapshot(username, self.load(username))
+
+    def save_snapshot(self, username, task_list):
+        """Store task_list as the user's snapshot in the backend and empty their log."""
+        path = self._log_path(username)
+        with self._lock, file_lock(path):
+            self._pending.pop(username, None)
+            task_list.drain_ops()
+            self.store.save(username, task_list.to_snapshot())
+            # The snapshot must be durable before the log it replaces is dropped;
+            # replaying ops is idempotent, so a crash in between is harmless.
+            self.store.flush()
+            if os.path.exists(path):
+                os.remove(path)
+
+    def compact(self, username):
+        """Fold the user's op log into a snapshot in the backend."""
+        with self._lock:
+            self._writer.flush()
+            self.save_snapshot(username, self.load(username))
+
+    def compact_all(self):
+        """Fold every user's op log into the backend, e.g. before migrating the backend's files."""
+        with self._lock:
+            self._writer.flush()
+            usernames = {op["user"] for name in os.listdir(self.directory) if name.endswith(".log")
+                         for op in self._read_ops(os.path.join(self.directory, name))}
+            for username in usernames:
+                self.compact(username)
+            return len(usernames)
 
 class UserToDoList:
 
     @staticmethod
+    @timed("todo_load_all")
     def load_tasks():
-        """Load tasks from the file if it exists."""
-        if os.path.exists(TASKS_FILE_PATH):
-            with open(TASKS_FILE_PATH, 'r') as file:
-                try:
-                    data = json.load(file)
-                    # If the loaded data is not a dictionary, return an empty dict.
-                    if isinstance(data, dict):
-                        return data
-                except json.JSONDecodeError:
-                    return {}
-        return {} 
+        """Load every user's tasks from the configured backend (op logs are folded in first)."""
+        get_task_oplog().compact_all()
+        return get_task_store().load()
 
     @staticmethod
+    @timed("todo_save_all")
     def save_tasks(tasks):
-        """Save tasks to the JSON file in a structured format."""
-        with open(TASKS_FILE_PATH, 'w') as file:
-            json.dump(tasks, file, indent = 4)
+        """Save every user's tasks to the configured backend."""
+        get_task_store().replace_all(tasks)
     
     @staticmethod
+    @timed("todo_load")
     def load_tasks_for_user(username):
         """Retrieve the list of tasks for the given username."""
-        all_tasks = UserToDoList.load_tasks()
-        return all_tasks.get(username, [])
+        return UserToDoList.load_task_list(username).to_records()
     
     @staticmethod
+    @timed("todo_save")
     def save_tasks_for_user(username, tasks):
         """Save tasks for a specific user."""
-        all_tasks = UserToDoList.load_tasks()
-        all_tasks[username] = tasks
-        UserToDoList.save_tasks(all_tasks)
-        
+        UserToDoList.save_task_list(username, TaskList.from_records(tasks))
+
+    @staticmethod
+    @timed("todo_load_list")
+    def load_task_list(username):
+        """Load a user's tasks as a TaskList (legacy string tasks are converted)."""
+        return get_task_oplog().load(username)
+
+    @staticmethod
+    @timed("todo_save_list")
+    def save_task_list(username, task_list):
+        """Save the whole list as the user's snapshot."""
+        get_task_oplog().save_snapshot(username, task_list)
+
+    @staticmethod
+    @timed("todo_record_changes")
+    def record_changes(username, task_list):
+        """Save only the operations made on task_list since the last save, via the user's op log."""
+        get_task_oplog().append(username, task_list.drain_ops())
+
     def run_todo_list(username):
         """Run the user-specific to-do list menu."""
-        tasks = UserToDoList.load_tasks_for_user(username)
+        tasks = UserToDoList.load_task_list(username)
         print(f"\n📌 Welcome to your To-Do List, {username.capitalize()}!")
         
         while True:
@@ -56,9 +551,10 @@ class UserToDoList:
             if choice == "1":
                 new_task = input("📝 Add a new task: ").strip()
                 if new_task:
-                    if new_task not in tasks:
-                        tasks.append(new_task)
-                        UserToDoList.save_tasks_for_user(username, tasks)
+                    task = tasks.add(new_task)
+                    if task:
+                        UserToDoList.record_changes(username, tasks)
+                        audit_log.record_event(audit_log.TASK_ADDED, username, task_id=task.id)
                         print(f"✅ Task '{new_task}' added successfully!")
                     else:
                         print("⚠️ Task already exists!")
@@ -67,18 +563,19 @@ class UserToDoList:
             elif choice == "2":
                 if tasks:
                     print("\n📋 Your Tasks:")
-                    for index, task in enumerate(tasks, start=1):
-                        print(f"🔹 {index}. {task}")
+                    for task in tasks:
+                        print(f"🔹 {task.id}. {'✅ ' if task.done else ''}{task.text}")
                 else:
                     print("📭 Your to-do list is empty!")
             elif choice == "3":
                 if tasks:
                     try:
-                        task_index = int(input("❌ Enter the number of the task to remove: ")) - 1
-                        if 0 <= task_index < len(tasks):
-                            removed_task = tasks.pop(task_index)
-                            UserToDoList.save_tasks_for_user(username, tasks)
-                            print(f"🗑️ Task '{removed_task}' removed successfully!")
+                        task_id = int(input("❌ Enter the number of the task to remove: "))
+                        removed_task = tasks.remove(task_id)
+                        if removed_task:
+                            UserToDoList.record_changes(username, tasks)
+                            audit_log.record_event(audit_log.TASK_REMOVED, username, task_id=task_id)
+                            print(f"🗑️ Task '{removed_task.text}' removed successfully!")
                         else:
                             print("⚠️ Invalid task number.")
                     except ValueError:
@@ -88,16 +585,17 @@ class UserToDoList:
             elif choice == "4":
                 if tasks:
                     try:
-                        task_index = int(input("✅ Enter the number of the task to mark as completed: ")) - 1
-                        if 0 <= task_index < len(tasks):
-                            if not tasks[task_index].startswith("✅"):
-                                tasks[task_index] = f"✅ {tasks[task_index]}"
-                                UserToDoList.save_tasks_for_user(username, tasks)
-                                print("🎯 Task marked as completed!")
-                            else:
-                                print("ℹ️ This task is already marked as completed.")
-                        else:
+                        task_id = int(input("✅ Enter the number of the task to mark as completed: "))
+                        task = tasks.get(task_id)
+                        if task is None:
                             print("⚠️ Invalid task number.")
+                        elif not task.done:
+                            tasks.complete(task_id)
+                            UserToDoList.record_changes(username, tasks)
+                            audit_log.record_event(audit_log.TASK_COMPLETED, username, task_id=task_id)
+                            print("🎯 Task marked as completed!")
+                        else:
+                            print("ℹ️ This task is already marked as completed.")
                     except ValueError:
                         print("⚠️ Please enter a valid number.")
                 else:
@@ -106,4 +604,15 @@ class UserToDoList:
                 print("👋 Exiting your To-Do List. Goodbye!")
                 break
             else:
-                print("⚠️ Invalid choice, please try again.")
\ No newline at end of file
+                print("⚠️ Invalid choice, please try again.")
+
+if __name__ == "__main__":
+    # Usage: python to_do_list.py split [to_do_list.json] [shard directory]
+    if len(sys.argv) < 2 or sys.argv[1] != "split":
+        print("Usage: python to_do_list.py split [to_do_list.json] [shard directory]")
+        sys.exit(1)
+    paths = sys.argv[2:] + [TASKS_FILE_PATH, TASKS_SHARD_DIR][len(sys.argv[2:]):]
+    if TASKS_BACKEND == "json":
+        get_task_oplog().compact_all()
+    users = split_tasks_file(paths[0], paths[1])
+    print(f"✅ Split the tasks of {users} user(s) into {paths[1]}")
@@ -1,5 +1,6 @@
-import re, random, string
+import random, string
 from datetime import datetime
+from profile_validation import PHONE_PATTERN, PASSWORD_PATTERN, EMAIL_PATTERN
 
 class UserAccount:
 
@@ -30,9 +31,7 @@ class UserAccount:
         return input("Please enter your phone number without the area code: ").strip()
 
     def validate_phone_number(self, phone_number):
-        # Pattern to validate phone number (must include exactly 10 digits and can contain optional hyphens or spaces)
-        pattern = r"^(?=.*\d)(?:\(?\d{3}\)?[\s\-]?)?\d{3}[\s\-]?\d{4}$"
-        return re.fullmatch(pattern, phone_number)
+        return PHONE_PATTERN.fullmatch(phone_number)
 
     # *********************** Password Generator ***********************
     def get_generated_password(self, length=12):
@@ -40,11 +39,8 @@ class UserAccount:
         return "".join(random.choice(characters) for _ in range(length))
 
     def validate_password(self, password):
-        # Pattern to require at least one digit, one lowercase letter, one uppercase letter, and one special character
-        pattern = r"^(?=.*\d)(?=.*[a-z])(?=.*[A-Z])(?=.*[!@#\$%\^&\*\(\)_\+\-=\[\]\{\};:'\",<>\./?]).{8,}$"
-        return re.fullmatch(pattern, password)
+        return PASSWORD_PATTERN.fullmatch(password)
 
     # *********************** Email Validator ***********************
     def validate_email(self, email):
-        pattern = r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"
-        return re.fullmatch(pattern, email)
+        return EMAIL_PATTERN.fullmatch(email)